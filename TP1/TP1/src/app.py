@@ -11,7 +11,7 @@
 '''
 
 import dash
-from dash_core_components import Graph
+from dash_core_components import Graph, Interval, Store
 import dash_html_components as html
 from dash.dependencies import Input, Output, State
 
@@ -25,8 +25,27 @@ import numpy as np
 app = dash.Dash(__name__)
 app.title = 'TP1 | INF8808'
 
+# Number of points to display. When None, between 1 and 10 points are drawn.
+NB_OF_PTS = None
 
-def generate_data():
+# Above this number of points, the scatter plot is rendered with WebGL.
+WEBGL_THRESHOLD = 10 ** 4
+
+# Above this number of points, the points are binned on the server and
+# rendered as a density heatmap of NB_OF_BINS x NB_OF_BINS cells.
+DENSITY_THRESHOLD = 10 ** 6
+NB_OF_BINS = 200
+
+# In streaming mode, new points are added every STREAM_INTERVAL milliseconds
+# and at most STREAM_MAX_PTS points are kept in the graph.
+STREAM_INTERVAL = 1000
+STREAM_MAX_PTS = 10 ** 4
+
+# Range of the x and y axes, also used as the extent of the density grid.
+AXIS_RANGE = [0, 100]
+
+
+def generate_data(nb_of_pts=None):
     '''
                 Generates random data to be displayed in the scatter plot.
 
@@ -34,7 +53,7 @@ def generate_data():
                         - x : an integer in [1, 99],
                         - y : an integer in [1, 99],
 
-                and where m is a random number in [1, 10].
+                and where m is a random number in [1, 10], or nb_of_pts if given.
 
                 For example, the coordinates could be :
             x  |  y
@@ -42,16 +61,65 @@ def generate_data():
             99 | 4
             27 | 89
             17 | 42
+    Args:
+                nb_of_pts: The number of points to generate, if not random.
     Returns:
                 A pandas dataframe with columns 'x' and 'y' containing the randomly
                 generated coordinate data.
     '''
     # TODO: Return the data generated as described above
-    m = np.random.randint(1, 11)
-    table = np.random.randint(1, 99, size=(m, 2))
+    m = np.random.randint(1, 11) if nb_of_pts is None else nb_of_pts
+    # uint8 is enough for [1, 99] and keeps millions of points small
+    table = np.random.randint(1, 99, size=(m, 2), dtype=np.uint8)
     return pd.DataFrame(table, columns=['x', 'y'])
 
 
+def get_render_mode(nb_of_pts):
+    '''
+        Chooses how the points are rendered depending on how many there are.
+
+        Args:
+            nb_of_pts: The number of points to display.
+        Returns:
+            'svg' for a regular scatter plot, 'webgl' for a WebGL scatter plot
+            or 'density' for a heatmap of the binned points.
+    '''
+    if nb_of_pts > DENSITY_THRESHOLD:
+        return 'density'
+    if nb_of_pts > WEBGL_THRESHOLD:
+        return 'webgl'
+    return 'svg'
+
+
+def bin_data(dataframe):
+    '''
+        Aggregates the points into a NB_OF_BINS x NB_OF_BINS density grid
+        covering AXIS_RANGE on both axes.
+
+        The bin index of each point is computed with vectorized arithmetic and
+        the cells are counted with a single call to np.bincount, so the
+        result's size depends on the grid and not on the number of points.
+
+        Args:
+            dataframe: The data to aggregate.
+        Returns:
+            centers: The coordinates of the bin centers, on both axes
+            counts: The number of points per cell, indexed as [y bin][x bin]
+    '''
+    width = (AXIS_RANGE[1] - AXIS_RANGE[0]) / NB_OF_BINS
+    centers = AXIS_RANGE[0] + width * (np.arange(NB_OF_BINS) + 0.5)
+
+    x_bins = ((dataframe.x.to_numpy() - AXIS_RANGE[0]) / width).astype(np.intp)
+    y_bins = ((dataframe.y.to_numpy() - AXIS_RANGE[0]) / width).astype(np.intp)
+    np.clip(x_bins, 0, NB_OF_BINS - 1, out=x_bins)
+    np.clip(y_bins, 0, NB_OF_BINS - 1, out=y_bins)
+
+    counts = np.bincount(y_bins * NB_OF_BINS + x_bins,
+                         minlength=NB_OF_BINS * NB_OF_BINS)
+
+    return centers, counts.reshape(NB_OF_BINS, NB_OF_BINS)
+
+
 def get_layout():
     '''
         Gets the Graph Object-formatted Layout used for the figure.
@@ -64,9 +132,9 @@ def get_layout():
         font_family='Helvetica',
         font_color='#000000',
         xaxis_title='Axe x',
-        xaxis_range=[0, 100],
+        xaxis_range=AXIS_RANGE,
         yaxis_title='Axe y',
-        yaxis_range=[0, 100],
+        yaxis_range=AXIS_RANGE,
         template=pio.templates['simple_white']
     )
 
@@ -78,6 +146,11 @@ def init_figure(dataframe, layout):
         The figure's data is initialised as a Scatter graph object. The mode is "markers" and
         their color is "#07BEB8". Their size is 10.
 
+        Past WEBGL_THRESHOLD points, a WebGL Scattergl trace is used instead.
+        Past DENSITY_THRESHOLD points, the points are binned on the server
+        and displayed as a Heatmap, so the figure's size is bounded by the
+        number of bins.
+
         See link :
              https://plotly.com/python/creating-and-updating-figures/#figures-as-graph-objects
 
@@ -88,24 +161,42 @@ def init_figure(dataframe, layout):
             The Graph Object-formatted figure to be displayed.
     '''
     # TODO: Return Figure defined as described above, using the provided layout
+    render_mode = get_render_mode(len(dataframe))
+
+    if render_mode == 'density':
+        centers, counts = bin_data(dataframe)
+        return go.Figure(
+            data=go.Heatmap(
+                x=centers,
+                y=centers,
+                z=counts,
+                colorscale=[[0, '#ffffff'], [1, '#07BEB8']],
+                colorbar_title='Points'
+            ),
+            layout=layout
+        )
+
+    scatter = go.Scattergl if render_mode == 'webgl' else go.Scatter
     return go.Figure(
-        data=go.Scatter(
+        data=scatter(
             x=dataframe.x,
             y=dataframe.y,
             mode='markers',
             marker_color="#07BEB8",
-            marker_size=10
+            marker_size=10 if render_mode == 'svg' else 3
         ),
         layout=layout
     )
 
 
-def init_app_layout(figure):
+def init_app_layout(figure, nb_of_pts, streamable):
     '''
         Generates the HTML layout representing the app.
 
         Args:
             figure: The figure to display.
+            nb_of_pts: The number of points in the figure.
+            streamable: Whether the streaming mode can be enabled.
         Returns:
             The HTML structure of the app's web page.
     '''
@@ -130,91 +221,168 @@ def init_app_layout(figure):
                         'staticPlot': True
                     }
                 ),
+                Interval(
+                    id='stream-interval',
+                    interval=STREAM_INTERVAL,
+                    disabled=True
+                ),
+                # The number of points displayed by this client
+                Store(id='nb-of-pts', data=nb_of_pts),
                 html.Div(className='info-panel', children=[
-                    html.Div(id='info-text'),
-                    html.Button('Actualiser', id='update-btn')
+                    html.Div(id='info-text', children=update_label(nb_of_pts)),
+                    html.Div(children=[
+                        html.Button(
+                            'Diffuser',
+                            id='stream-btn',
+                            disabled=not streamable
+                        ),
+                        html.Button('Actualiser', id='update-btn')
+                    ])
                 ])
             ])
         ])
     ])
 
 
-def update_figure(figure):
+def update_figure(dataframe):
     '''
-        Updates the figure by regenerating the random data to display.
+        Builds the update to apply to the displayed figure so it shows
+        the given data.
+
+        Rather than sending the whole figure back to the client, only the
+        new x and y arrays are sent through the graph's 'extendData'
+        property. The maximum number of points is set to the number of
+        new points, so the previous points are dropped and the layout and
+        template are left untouched on the client.
+
+        In density mode, the rows of the new density grid replace those of
+        the heatmap in the same way, so the update's size is bounded by the
+        number of bins.
 
         Args:
-            figure: The figure to update.
+            dataframe: The data to display in the figure.
         Returns:
-            updated_fig: The figure with updated data.
+            The 'extendData' value, as [update, trace indices, max points].
     '''
+    if get_render_mode(len(dataframe)) == 'density':
+        _, counts = bin_data(dataframe)
+        return [dict(z=[counts.tolist()]), [0], NB_OF_BINS]
 
-    updated_df = generate_data()
-
-    figure = go.Figure(figure)  # conversion back to Graph Object
+    update = dict(x=[dataframe.x.tolist()], y=[dataframe.y.tolist()])
 
-    if not updated_df.empty:
-        figure.update_traces(x=updated_df.x, y=updated_df.y)
+    return [update, [0], len(dataframe)]
 
-    return figure
 
-
-def update_label(figure):
+def update_label(nb_of_pts):
     '''
         Updates the information panel  displayed under the graph. It shows
         the number of points that are currently displayed in the graph.
 
         Args:
-            figure: The figure to be displayed
+            nb_of_pts: The number of points displayed in the graph
         Returns:
             label_elements: The information elements to display
             under the graph, where the number of points is displayed in bold.
     '''
 
-    figure = go.Figure(figure)  # conversion back to Graph Object
-
     # TODO: Create HTML elements for the label
     # The text should say 'Il y a X point' or 'Il y a : X points'
     # depending on how many points there are, where X  is the number of points
 
-    nb_pts = len(figure.data[0].x)
-
     return [
         html.Span("Il y a : "),
-        html.Span(nb_pts, style={"fontWeight": "bold"}),
-        html.Span(' points' if nb_pts > 1 else ' point')
+        html.Span(nb_of_pts, style={"fontWeight": "bold"}),
+        html.Span(' points' if nb_of_pts > 1 else ' point')
     ]
 
 
+def stream_figure(dataframe):
+    '''
+        Builds the update appending the given points to the displayed
+        figure, keeping at most STREAM_MAX_PTS points.
+
+        Args:
+            dataframe: The new points to display.
+        Returns:
+            The 'extendData' value, as [update, trace indices, max points].
+    '''
+    update = dict(x=[dataframe.x.tolist()], y=[dataframe.y.tolist()])
+
+    return [update, [0], STREAM_MAX_PTS]
+
+
 @app.callback(
-    [Output('example-graph', 'figure'), Output('info-text', 'children')],
-    [Input('update-btn', 'n_clicks')],
-    [State('example-graph', 'figure')]
+    [Output('example-graph', 'extendData'),
+     Output('info-text', 'children'),
+     Output('nb-of-pts', 'data')],
+    [Input('update-btn', 'n_clicks'), Input('stream-interval', 'n_intervals')],
+    [State('nb-of-pts', 'data')],
+    prevent_initial_call=True
 )
-def button_clicked(n_clicks, figure):
+def data_updated(n_clicks, n_intervals, nb_of_pts):  # pylint: disable=unused-argument
     '''
-        Updates the application after a click on the 'Actualiser' button.
+        Updates the application after a click on the 'Actualiser' button
+        or a tick of the streaming interval.
+
+        The figure is not round-tripped through the callback : only the
+        new data and the point count are sent to the client. A click
+        replaces every point, while a tick appends a few new points
+        to the figure, so its cost does not depend on how long the
+        stream has been running.
+
+        The number of points is kept by each client, so the streams
+        of several clients are counted separately.
 
         Args:
             n_clicks: The number of times the buttton has been clicked so far
-            figure: The figure as it is currently displayed
+            n_intervals: The number of ticks of the streaming interval so far
+            nb_of_pts: The number of points displayed by the client
         Returns:
-            figure: The figure to display after the click on the 'Actualiser' button
+            extend_data: The data to add to the displayed figure
             label_content: The new content to display in the information panel
+            nb_of_pts: The new number of points displayed by the client
     '''
+    ctx = dash.callback_context
 
-    if n_clicks is not None:
-        figure = update_figure(figure)
+    if ctx.triggered[0]['prop_id'].split('.')[0] == 'stream-interval':
+        new_df = generate_data()
+        nb_of_pts = min(nb_of_pts + len(new_df), STREAM_MAX_PTS)
+        return stream_figure(new_df), update_label(nb_of_pts), nb_of_pts
 
-    label_content = update_label(figure)
+    updated_df = generate_data(NB_OF_PTS)
 
-    return figure, label_content
+    return update_figure(updated_df), update_label(len(updated_df)), len(updated_df)
+
+
+@app.callback(
+    [Output('stream-interval', 'disabled'), Output('stream-btn', 'children')],
+    [Input('stream-btn', 'n_clicks')],
+    prevent_initial_call=True
+)
+def stream_clicked(n_clicks):
+    '''
+        Starts or stops the streaming mode after a click on the
+        'Diffuser' button.
+
+        Args:
+            n_clicks: The number of times the buttton has been clicked so far
+        Returns:
+            disabled: Whether the streaming interval is disabled
+            label: The new text of the button
+    '''
+    streaming = n_clicks % 2 == 1
+
+    return not streaming, 'Arrêter' if streaming else 'Diffuser'
 
 
 lyt = get_layout()
 
-df = generate_data()
+df = generate_data(NB_OF_PTS)
 
 fig = init_figure(df, lyt)
 
-app.layout = init_app_layout(fig)
+app.layout = init_app_layout(
+    fig,
+    len(df),
+    get_render_mode(len(df)) != 'density'
+)
@@ -11,53 +11,115 @@
 '''
 
 
+import functools
+
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
-from dash.dependencies import Input, Output, State
-
-import pandas as pd
+from dash.dependencies import Input, Output, State, ClientsideFunction
 
 import preprocess
 import bar_chart
+import sequence_chart
+import cache
+import search
 
-from template import create_template
+from template import create_template, THEME
 from modes import MODES
 
 
 app = dash.Dash(__name__)
 app.title = 'TP2 | INF8808'
 
+# When True, the display mode is switched in the browser using the
+# figures precomputed for each mode. Otherwise, the server returns the
+# figure precomputed for the selected mode.
+CLIENTSIDE_MODES = True
+
+# Every .csv file in DATA_DIR is a play. Their line counts are cached in
+# CACHE_DIR, and the plays are read and counted by chunks of CHUNKSIZE lines.
+DATA_DIR = './assets/data'
+CACHE_DIR = './cache'
+CHUNKSIZE = 100000
+
+# At most this many search results are listed under the chart
+MAX_RESULTS = 50
+
+# By default, the players not in the top TOP_N are grouped as 'Other'
+TOP_N = 5
+
 
-def prep_data():
+def build_index(my_cube, my_lines):
     '''
-        Imports the .csv file and does some preprocessing.
+        Builds the hierarchical index answering each drill-down level :
+        the ranking of the players of each play with their line counts
+        per act, their line counts per scene of each act and the
+        sequence of speakers of each scene.
 
+        Each table is grouped once here, so the callbacks only do lookups.
+
+        Args:
+            my_cube: The line counts of every play, per act, scene and player
+            my_lines: The player of each line of every play
         Returns:
-            A pandas dataframe containing the preprocessed data.
+            A dictionary keyed by play, containing the ranking of the
+            players with their line counts per act under 'acts', the
+            rankings with the line counts per scene keyed by act
+            under 'scenes' and the speakers keyed by (act, scene)
+            under 'lines'.
+    '''
+    plays = {}
+    for play, play_cube in my_cube.groupby(by='Play', observed=True):
+        acts = preprocess.clean_names(preprocess.summarize_lines(play_cube))
+        acts = preprocess.rank_players(acts)
+        scenes = preprocess.clean_names(preprocess.summarize_scenes(play_cube))
+        plays[play] = dict(
+            acts=acts,
+            scenes={
+                int(act): preprocess.rank_players(act_scenes, 'Scene', acts['players'])
+                for act, act_scenes in scenes.groupby(by='Act')
+            },
+            lines={}
+        )
+
+    for (play, act, scene), scene_lines in my_lines.groupby(by=['Play', 'Act', 'Scene'], observed=True):
+        plays[play]['lines'][(int(act), int(scene))] = dict(
+            Line=scene_lines['Line'].to_numpy(),
+            Player=scene_lines['Player'].astype(str).str.title().to_numpy()
+        )
+
+    return plays
+
+
+def get_play_label(play):
     '''
-    dataframe = pd.read_csv('./assets/data/romeo_and_juliet.csv')
+        Formats the name of a play to be displayed.
 
-    proc_data = preprocess.summarize_lines(dataframe)
-    proc_data = preprocess.replace_others(proc_data)
-    proc_data = preprocess.clean_names(proc_data)
-    
-    return proc_data
+        Args:
+            play: The name of the play's file, such as 'romeo_and_juliet'
+        Returns:
+            The formatted name, such as 'Romeo And Juliet'
+    '''
+    return play.replace('_', ' ').title()
 
 
-def init_app_layout(figure):
+def init_app_layout(figure, mode_data, plays, max_players):
     '''
         Generates the HTML layout representing the app.
 
         Args:
             figure: The figure to display.
+            mode_data: The figures of each mode, to switch modes in the browser, if any.
+            plays: The plays that can be displayed, the first one being displayed.
+                The acts of that play are displayed.
+            max_players: The largest number of players in a play.
         Returns:
             The HTML structure of the app's web page.
     '''
     return html.Div(className='content', children=[
         html.Header(children=[
             html.H1('Who\'s Speaking?'),
-            html.H2('An analysis of Shakespeare\'s Romeo and Juliet')
+            html.H2('An analysis of Shakespeare\'s plays')
         ]),
         html.Main(children=[
             html.Div(className='viz-container', children=[
@@ -72,30 +134,55 @@ def init_app_layout(figure):
                     ),
                     className='graph',
                     id='line-chart'
-                )
+                ),
+                html.Div(id='search-results'),
+                dcc.Store(id='mode-data', data=mode_data),
+                dcc.Store(id='highlight', data=None),
+                dcc.Store(id='view', data=dict(play=plays[0], act=None, scene=None, top_n=TOP_N))
             ])
         ]),
         html.Footer(children=[
             html.Div(className='panel', children=[
                 html.Div(id='info', children=[
-                    html.P('Use the radio buttons to change the display.'),
+                    html.P('Use the menu and the radio buttons to change the display.'),
+                    html.P('Click on a bar to see its details.'),
+                    html.P('Use the slider to choose how many players are not grouped as Other.'),
                     html.P(children=[
                         html.Span('The current mode is : '),
                         html.Span(MODES['count'], id='mode')
                     ])
                 ]),
                 html.Div(children=[
+                    dcc.Dropdown(
+                        id='play-dropdown',
+                        options=[
+                            dict(label=get_play_label(play), value=play)
+                            for play in plays
+                        ],
+                        value=plays[0],
+                        clearable=False
+                    ),
                     dcc.RadioItems(
                         id='radio-items',
                         options=[
-                            dict(
-                                label=MODES['count'],
-                                value=MODES['count']),
-                            dict(
-                                label=MODES['percent'],
-                                value=MODES['percent']),
+                            dict(label=mode, value=mode)
+                            for mode in MODES.values()
                         ],
                         value=MODES['count']
+                    ),
+                    dcc.Slider(
+                        id='top-n-slider',
+                        min=1,
+                        max=max_players,
+                        step=1,
+                        value=TOP_N,
+                        marks={n: str(n) for n in sorted({1, TOP_N, max_players})}
+                    ),
+                    html.Button('Back', id='back-btn'),
+                    dcc.Input(
+                        id='search-input',
+                        type='search',
+                        placeholder='Search the lines...'
                     )
                 ])
             ])
@@ -103,32 +190,261 @@ def init_app_layout(figure):
     ])
 
 
-@app.callback(
-    [Output('line-chart', 'figure'), Output('mode', 'children')],
-    [Input('radio-items', 'value')],
-    [State('line-chart', 'figure')]
-)
-def radio_updated(mode, figure):
+@functools.lru_cache(maxsize=256)
+def get_view_figures(play, act=None, scene=None, top_n=TOP_N):
     '''
-        Updates the application after the radio input is modified.
+        Gets the figures of a drill-down level, in each mode.
+
+        The figures are drawn from the index the first time they
+        are displayed, and then kept in a cache.
+
+        Args:
+            play: The displayed play
+            act: The displayed act, if any
+            scene: The displayed scene, if any
+            top_n: The number of players not grouped as 'Other'
+        Returns:
+            The figures of the level, keyed by mode
+    '''
+    if act is None:
+        act_fig = bar_chart.init_figure()
+        ranking = index[play]['acts']
+        return {mode: bar_chart.draw(act_fig, ranking, top_n, mode) for mode in MODES.values()}
+
+    if scene is None:
+        scene_fig = bar_chart.init_figure('Lines per scene in act {}'.format(act))
+        ranking = index[play]['scenes'][act]
+        return {mode: bar_chart.draw(scene_fig, ranking, top_n, mode, 'Scene')
+                for mode in MODES.values()}
+
+    # The sequence of speakers is the same in every mode
+    line_fig = sequence_chart.init_figure(act, scene)
+    line_fig = sequence_chart.draw(line_fig, index[play]['lines'][(act, scene)])
+    return {mode: line_fig for mode in MODES.values()}
+
+
+def get_view(play, click_data, top_n, view):
+    '''
+        Gets the drill-down level to display after an interaction.
+
+        Changing the play displays its acts. The 'Back' button goes
+        up one level and clicking on a bar goes down one level. The
+        slider changes how many players are not grouped as 'Other'.
+
+        Args:
+            play: The play selected in the dropdown
+            click_data: The data of the clicked bar, if any
+            top_n: The number of players selected with the slider
+            view: The currently displayed level
+        Returns:
+            The level to display, as a dictionary with keys 'play',
+            'act', 'scene' and 'top_n'
+    '''
+    trigger = dash.callback_context.triggered[0]['prop_id'].split('.')[0]
+
+    if trigger == 'play-dropdown':
+        return dict(view, play=play, act=None, scene=None)
+    if trigger == 'top-n-slider':
+        return dict(view, top_n=top_n)
+    if trigger == 'back-btn':
+        if view['scene'] is not None:
+            return dict(view, scene=None)
+        return dict(view, act=None)
+    if click_data is not None:
+        clicked = click_data['points'][0]['x']
+        if view['act'] is None:
+            return dict(view, act=int(clicked))
+        if view['scene'] is None:
+            return dict(view, scene=int(clicked))
+    return view
+
+
+def view_updated(play, click_data, n_clicks, top_n, view):  # pylint: disable=unused-argument
+    '''
+        Updates the displayed level after the selected play is
+        modified, a bar is clicked, the 'Back' button is clicked
+        or the slider is moved.
+
+        Args:
+            play: The play selected in the dropdown.
+            click_data: The data of the clicked bar, if any.
+            n_clicks: The number of times the 'Back' button was clicked.
+            top_n: The number of players selected with the slider.
+            view: The currently displayed level.
+        Returns:
+            view: The level to display
+            mode_figures: The figures of the level in each mode, if the
+            modes are switched in the browser
+    '''
+    view = get_view(play, click_data, top_n, view)
+
+    if not CLIENTSIDE_MODES:
+        return view, None
+
+    return view, get_view_figures(view['play'], view['act'], view['scene'], view['top_n'])
+
+
+def radio_updated(mode, view, highlight):
+    '''
+        Updates the application after the radio input, the
+        displayed level or the search results are modified.
+
+        Only used when the modes are not switched in the browser. The
+        figures are looked up or drawn from the index, never from the
+        raw lines.
 
         Args:
             mode: The mode selected in the radio input.
-            figure: The figure as it is currently displayed
+            view: The level to display.
+            highlight: The bars matching the search, if any.
         Returns:
             new_fig: The figure to display after the change of radio input
             mode: The new mode
     '''
-    # TODO : Update the figure's data and y axis, as well as the informational
-    # text indicating the mode
-    new_fig = bar_chart.draw(figure, data, mode)
+    new_fig = get_view_figures(view['play'], view['act'], view['scene'], view['top_n'])[mode]
+
+    if highlight is not None:
+        new_fig = bar_chart.add_highlight(new_fig, highlight)
+
     return new_fig, mode
 
 
-data = prep_data()
+def get_highlight(matches, view):
+    '''
+        Gets the bars, or markers, of the displayed level to outline
+        because they contain lines matching the search.
+
+        Args:
+            matches: The lines of the displayed play matching the search
+            view: The displayed level
+        Returns:
+            The x values to outline keyed by trace name under 'x', as well
+            as the outline's 'color' and 'width'
+    '''
+    if view['act'] is None:
+        level = 'Act'
+    elif view['scene'] is None:
+        matches = matches[matches['Act'] == view['act']]
+        level = 'Scene'
+    else:
+        matches = matches[(matches['Act'] == view['act']) & (matches['Scene'] == view['scene'])]
+        level = 'Line'
+
+    if level == 'Line':
+        traces = ['Lines'] * len(matches)
+    else:
+        top_players = set(index[view['play']]['acts']['players'][:view['top_n']])
+        traces = [player if player in top_players else 'Other'
+                  for player in matches['Player'].astype(str).str.title()]
+
+    highlight_x = {}
+    for trace, x_value in zip(traces, matches[level].tolist()):
+        highlight_x.setdefault(trace, set()).add(x_value)
+
+    return dict(x={trace: sorted(x_values) for trace, x_values in highlight_x.items()},
+                color=THEME['highlight_color'], width=THEME['highlight_width'])
+
+
+def get_results(matches):
+    '''
+        Generates the list of the lines matching the search.
+
+        Args:
+            matches: The lines of the displayed play matching the search
+        Returns:
+            The HTML elements listing the first MAX_RESULTS lines
+    '''
+    plural = '' if len(matches) == 1 else 's'
+    return [
+        html.P('{} line{} found'.format(len(matches), plural)),
+        html.Ul(children=[
+            html.Li(children=[
+                html.B('Act {}, scene {}, line {} - {} : '.format(
+                    line.Act, line.Scene, line.Line, str(line.Player).title())),
+                html.Span(line.PlayerLine)
+            ]) for line in matches.head(MAX_RESULTS).itertuples()
+        ])
+    ]
+
+
+def search_updated(query, view):
+    '''
+        Updates the search results after the query or the
+        displayed level is modified.
+
+        The matching lines are found with the inverted index, and
+        only those lines are then read.
+
+        Args:
+            query: The word or phrase to find
+            view: The displayed level
+        Returns:
+            highlight: The bars matching the search, if any
+            results: The list of the matching lines
+    '''
+    if not query:
+        return None, []
+
+    matches = lines.iloc[search.find_lines(search_index, query)]
+    matches = matches[matches['Play'] == view['play']]
+
+    return get_highlight(matches, view), get_results(matches)
+
+
+cube, lines = cache.load_corpus(DATA_DIR, CACHE_DIR, CHUNKSIZE)
 
 create_template()
 
-fig = bar_chart.init_figure()
+index = build_index(cube, lines)
+
+search_index = search.build_search_index(lines)
+
+play_names = sorted(index)
+
+max_nb_of_players = max(len(play_index['acts']['players']) for play_index in index.values())
+
+app.callback(
+    [Output('view', 'data'), Output('mode-data', 'data')],
+    [Input('play-dropdown', 'value'),
+     Input('line-chart', 'clickData'),
+     Input('back-btn', 'n_clicks'),
+     Input('top-n-slider', 'value')],
+    [State('view', 'data')],
+    prevent_initial_call=True
+)(view_updated)
+
+app.callback(
+    [Output('highlight', 'data'), Output('search-results', 'children')],
+    [Input('search-input', 'value'), Input('view', 'data')],
+    prevent_initial_call=True
+)(search_updated)
 
-app.layout = init_app_layout(fig)
+if CLIENTSIDE_MODES:
+    app.clientside_callback(
+        ClientsideFunction(namespace='modes', function_name='switch_mode'),
+        [Output('line-chart', 'figure'), Output('mode', 'children')],
+        [Input('radio-items', 'value'),
+         Input('mode-data', 'data'),
+         Input('highlight', 'data')],
+        prevent_initial_call=True
+    )
+    app.layout = init_app_layout(
+        get_view_figures(play_names[0])[MODES['count']],
+        get_view_figures(play_names[0]),
+        play_names,
+        max_nb_of_players
+    )
+else:
+    app.callback(
+        [Output('line-chart', 'figure'), Output('mode', 'children')],
+        [Input('radio-items', 'value'),
+         Input('view', 'data'),
+         Input('highlight', 'data')],
+        prevent_initial_call=True
+    )(radio_updated)
+    app.layout = init_app_layout(
+        get_view_figures(play_names[0])[MODES['count']],
+        None,
+        play_names,
+        max_nb_of_players
+    )
@@ -0,0 +1,41 @@
+/*
+    Contains the clientside callbacks of the app.
+
+    Dash loads every .js file in the assets folder, so the functions
+    defined here can be referenced with a ClientsideFunction.
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    modes: {
+        /*
+            Displays the figure of the given mode among the figures
+            precomputed for the displayed level, outlining the bars
+            matching the search. No request is sent to the server.
+        */
+        switch_mode: function (mode, modeFigures, highlight) {
+            const figure = modeFigures[mode];
+
+            if (!highlight) {
+                return [figure, mode];
+            }
+
+            const data = figure.data.map(function (trace) {
+                const matches = highlight.x[trace.name];
+                if (!matches) {
+                    return trace;
+                }
+                const marker = Object.assign({}, trace.marker, {
+                    line: {
+                        color: highlight.color,
+                        width: trace.x.map(function (x) {
+                            return matches.indexOf(x) >= 0 ? highlight.width : 0;
+                        })
+                    }
+                });
+                return Object.assign({}, trace, {marker: marker});
+            });
+
+            return [Object.assign({}, figure, {data: data}), mode];
+        }
+    }
+});
@@ -1,21 +1,26 @@
 '''
     Contains some functions related to the creation of the bar chart.
-    The bar chart displays the data either as counts or as percentages.
+    The bar chart displays the data as counts or percentages of lines,
+    or as counts of words or characters.
 '''
 
 import plotly.graph_objects as go
 import plotly.io as pio
 
 from hover_template import get_hover_template
-from modes import MODES, MODE_TO_COLUMN
+from modes import MODES, MODE_TO_COLUMN, MODE_TO_LABEL
+from preprocess import get_others
 
 
-def init_figure():
+def init_figure(title='Lines per act'):
     '''
         Initializes the Graph Object figure used to display the bar chart.
         Sets the template to be used to "simple_white" as a base with
         our custom template on top. Sets the title to 'Lines per act'
+        unless another title is given.
 
+        Args:
+            title: The title of the bar chart
         Returns:
             fig: The figure which will display the bar chart
     '''
@@ -25,7 +30,7 @@ def init_figure():
     pio.templates.default = pio.templates['simple_white']
 
     fig.update_layout(
-        title='Lines per act',
+        title=title,
         template=pio.templates['my_custom_theme'],
         dragmode=False,
         barmode='relative'
@@ -34,33 +39,48 @@ def init_figure():
     return fig
 
 
-def draw(fig, data, mode):
+def draw(fig, ranking, top_n, mode, level='Act'):
     '''
-        Draws the bar chart.
+        Draws the bar chart, with a bar per player for the top
+        top_n players and an 'Other' bar for the other players.
+
+        The bars are read from the ranking's matrices, so drawing
+        for another top_n or mode does not group any dataframe.
 
         Arg:
             fig: The figure comprising the bar chart
-            data: The data to be displayed
+            ranking: The ranking returned by preprocess.rank_players
+            top_n: The number of players not grouped as 'Other'
             mode: Whether to display the count or percent data.
+            level: The ranking's columns, 'Act' or 'Scene'.
         Returns:
             fig: The figure comprising the drawn bar chart
     '''
     fig = go.Figure(fig)  # conversion back to Graph Object
     # Update the figure's data according to the selected mode DONE
     fig.data = []
-    
-    for player, player_data in data.groupby(by='Player'):
-        fig.add_trace(go.Bar(name=player, x=player_data['Act'], y=player_data[MODE_TO_COLUMN[mode]], hovertemplate=get_hover_template(player, mode)))
 
+    column = MODE_TO_COLUMN[mode]
+    bars = {'Other': (ranking['x'], get_others(ranking, top_n, column))}
+    for player, counts, values in zip(ranking['players'][:top_n],
+                                      ranking['LineCount'][:top_n],
+                                      ranking[column][:top_n]):
+        # Like in the summarized data, a player has no bar where they have no lines
+        bars[player] = (ranking['x'][counts > 0], values[counts > 0])
 
-    fig.update_layout(barmode='stack', xaxis= {'tickprefix': 'Act '})
+    for player in sorted(bars):
+        x_values, y_values = bars[player]
+        if len(x_values) > 0:
+            fig.add_trace(go.Bar(name=player, x=x_values, y=y_values, hovertemplate=get_hover_template(player, mode)))
+
+    fig.update_layout(barmode='stack', xaxis= {'tickprefix': level + ' '})
     return update_y_axis(fig, mode)
 
 
 def update_y_axis(fig, mode):
     '''
-        Updates the y axis to say 'Lines (%)' or 'Lines (Count) depending on
-        the current display.
+        Updates the y axis to say 'Lines (%)', 'Lines (Count)', 'Words (Count)'
+        or 'Characters (Count)' depending on the current display.
 
         Args:
             mode: Current display mode
@@ -68,5 +88,30 @@ def update_y_axis(fig, mode):
             The updated figure
     '''
     # Update the y axis title according to the current mode DONE
-    fig.update_layout(yaxis_title='Lines (%)' if mode == MODES['percent'] else 'Lines (Count)')
-    return fig
\ No newline at end of file
+    unit = '%' if mode == MODES['percent'] else 'Count'
+    fig.update_layout(yaxis_title='{} ({})'.format(MODE_TO_LABEL[mode], unit))
+    return fig
+
+
+def add_highlight(fig, highlight):
+    '''
+        Outlines the bars, or the markers, matching a search.
+
+        Arg:
+            fig: The figure to highlight, which is not modified
+            highlight: The x values to outline, keyed by trace name,
+                under 'x', and the outline's 'color' and 'width'
+        Returns:
+            fig: A copy of the figure with the outlines
+    '''
+    fig = go.Figure(fig)
+
+    for trace in fig.data:
+        matches = set(highlight['x'].get(trace.name, []))
+        if matches:
+            trace.marker.line = dict(
+                color=highlight['color'],
+                width=[highlight['width'] if x in matches else 0 for x in trace.x]
+            )
+
+    return fig
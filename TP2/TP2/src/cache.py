@@ -0,0 +1,163 @@
+'''
+    Contains some functions to build the line count cube of a corpus
+    of plays and to cache it on disk.
+
+    Each play's line counts, and the player and text of its lines, are
+    stored in Parquet files named after the hash of the play's .csv file,
+    so a play is only read again when its file changes.
+'''
+import glob
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import preprocess
+
+
+# Changed whenever the content of the cached tables changes
+CACHE_VERSION = 3
+
+
+def hash_file(path):
+    '''
+        Computes the hash of the content of a file.
+
+        Args:
+            path: The path to the file
+        Returns:
+            The SHA-1 hash of the file, as a hexadecimal string
+    '''
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(2 ** 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def get_play_name(path):
+    '''
+        Gets the name of a play from the path to its .csv file.
+
+        Args:
+            path: The path to the .csv file
+        Returns:
+            The name of the file, without its extension
+    '''
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def write_lines(chunks, lines_path):
+    '''
+        Writes each chunk of lines to a Parquet file as it goes
+        through, so the lines are cached without being kept in
+        memory.
+
+        The players are written as plain names, since each chunk
+        has its own categories.
+
+        Args:
+            chunks: The chunks of lines, as returned by
+                preprocess.read_lines
+            lines_path: The path to the Parquet file
+        Returns:
+            A generator over the chunks, to be consumed once
+    '''
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk.astype({'Player': str}), preserve_index=False,
+                                         schema=None if writer is None else writer.schema)
+            if writer is None:
+                writer = pq.ParquetWriter(lines_path, table.schema)
+            writer.write_table(table)
+            yield chunk
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def read_lines_table(lines_path):
+    '''
+        Reads the cached lines of a play.
+
+        Args:
+            lines_path: The path to the Parquet file
+        Returns:
+            A pandas dataframe with columns 'Act', 'Scene', 'Line',
+            'Player' and 'PlayerLine', sorted by act, scene and line
+    '''
+    lines = pd.read_parquet(lines_path)
+    lines = lines.sort_values(by=['Act', 'Scene', 'Line'], kind='mergesort', ignore_index=True)
+    lines['Player'] = lines['Player'].astype('category')
+    return lines
+
+
+def load_play(path, cache_dir, chunksize=None):
+    '''
+        Gets the line counts of the play, per act, scene and player,
+        as well as the player and text of each line.
+
+        They are read from the cache if the play's file has been
+        processed before, otherwise the file is streamed once: each
+        chunk is counted and written to the lines' cache, then
+        dropped, so only the counts are kept while reading.
+
+        Args:
+            path: The path to the play's .csv file
+            cache_dir: The directory containing the cached tables
+            chunksize: The number of lines per chunk when reading the play
+        Returns:
+            cube: The line counts, as returned by preprocess.build_cube
+            lines: A pandas dataframe with columns 'Act', 'Scene', 'Line',
+                'Player' and 'PlayerLine', sorted by act, scene and line
+    '''
+    key = '{}-v{}'.format(hash_file(path), CACHE_VERSION)
+    cube_path = os.path.join(cache_dir, key + '-cube.parquet')
+    lines_path = os.path.join(cache_dir, key + '-lines.parquet')
+
+    if os.path.exists(cube_path) and os.path.exists(lines_path):
+        return pd.read_parquet(cube_path), read_lines_table(lines_path)
+
+    chunks = preprocess.read_lines(path, with_text=True, chunksize=chunksize)
+    chunks = [chunks] if chunksize is None else chunks
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # The cube is written last, so an interrupted read is not taken for a cached one
+    cube = preprocess.build_cube(write_lines(chunks, lines_path))
+    cube.to_parquet(cube_path, index=False)
+    return cube, read_lines_table(lines_path)
+
+
+def load_corpus(data_dir, cache_dir, chunksize=None):
+    '''
+        Gets the line counts and the player and text of each line of
+        every play in the directory.
+
+        Args:
+            data_dir: The directory containing the plays' .csv files
+            cache_dir: The directory containing the cached tables
+            chunksize: The number of lines per chunk when reading a play
+        Returns:
+            cube: A pandas dataframe with columns 'Play', 'Act', 'Scene',
+                'Player', 'LineCount', 'WordCount' and 'CharCount'
+            lines: A pandas dataframe with columns 'Play', 'Act', 'Scene',
+                'Line', 'Player' and 'PlayerLine', sorted by play
+            In both, plays and players are categorical.
+    '''
+    cubes, lines = [], []
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        play_cube, play_lines = load_play(path, cache_dir, chunksize)
+        cubes.append(play_cube.assign(Play=get_play_name(path)))
+        lines.append(play_lines.assign(Play=get_play_name(path)))
+
+    cube = pd.concat(cubes, ignore_index=True)
+    lines = pd.concat(lines, ignore_index=True)
+    for table in (cube, lines):
+        table['Play'] = table['Play'].astype('category')
+        table['Player'] = table['Player'].astype('category')
+
+    return (cube[['Play', 'Act', 'Scene', 'Player'] + preprocess.COUNT_COLUMNS],
+            lines[['Play', 'Act', 'Scene', 'Line', 'Player', 'PlayerLine']])
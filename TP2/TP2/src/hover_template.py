@@ -1,7 +1,7 @@
 '''
     Provides the template for the hover tooltips.
 '''
-from modes import MODES
+from modes import MODES, MODE_TO_LABEL
 
 
 def get_hover_template(name, mode):
@@ -15,9 +15,10 @@ def get_hover_template(name, mode):
                 - Font color: Black
             * A bold label for the player name followed
                 by the hovered elements's player's name
-            * A bold label for the player's lines
-                followed by:
-                - The number of lines if the mode is 'Count'
+            * A bold label for the player's lines, words or
+                characters depending on the mode, followed by:
+                - The number of lines, words or characters if
+                    the mode is 'Count', 'Words' or 'Characters'
                 - The percent of lines fomatted with two
                     decimal points followed by a '%' symbol
                     if the mode is 'Percent'.
@@ -33,8 +34,26 @@ def get_hover_template(name, mode):
     title = '<span style="font-family: Grenze Gotisch; font-size: 24px; color: black;">%{x}</span>'
     player_name = '<b>Player :</b> {player_name}'.format(player_name=name)
 
-    player_line_format = '{y}' if mode == MODES['count'] else '{y:.2f}%'
-    player_line = '<b>Lines :</b> %{format}'.format(format=player_line_format) 
+    player_line_format = '{y:.2f}%' if mode == MODES['percent'] else '{y}'
+    player_line = '<b>{label} :</b> %{format}'.format(label=MODE_TO_LABEL[mode], format=player_line_format)
 
     # br is used to add spacing between the title and the player name and extra is used to remove the extra side title
     return title + '</br> </br> </br>' + player_name + '</br>' + player_line + '<extra></extra>'
+
+
+def get_sequence_hover_template():
+    '''
+        Sets the template for the hover tooltips of the
+        sequence of speakers in a scene.
+
+        The template contains a title stating the hovered line's
+        number, styled like the bar chart's title, followed by
+        a bold label for the player name and the player's name.
+
+        Returns:
+            The hover template with the elements descibed above
+    '''
+    title = '<span style="font-family: Grenze Gotisch; font-size: 24px; color: black;">Line %{x}</span>'
+    player_name = '<b>Player :</b> %{y}'
+
+    return title + '</br> </br> </br>' + player_name + '<extra></extra>'
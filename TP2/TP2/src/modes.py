@@ -1,7 +1,18 @@
 '''
-    This file contains some constants to help manage the app's two
-    display modes, Percent and Count.
+    This file contains some constants to help manage the app's
+    display modes, Count, Percent, Words and Characters.
 '''
 
-MODES = dict(count='Count', percent='Percent')
-MODE_TO_COLUMN = {MODES['count']: 'LineCount', MODES['percent']: 'LinePercent'}
+MODES = dict(count='Count', percent='Percent', words='Words', characters='Characters')
+MODE_TO_COLUMN = {
+    MODES['count']: 'LineCount',
+    MODES['percent']: 'LinePercent',
+    MODES['words']: 'WordCount',
+    MODES['characters']: 'CharCount'
+}
+MODE_TO_LABEL = {
+    MODES['count']: 'Lines',
+    MODES['percent']: 'Lines',
+    MODES['words']: 'Words',
+    MODES['characters']: 'Characters'
+}
@@ -1,43 +1,161 @@
 '''
     Contains some functions to preprocess the data used in the visualisation.
 '''
+import numpy as np
 import pandas as pd
 from modes import MODE_TO_COLUMN
 
 
+# Types of the columns of the play scripts. Categorical players
+# and small integers keep large corpora compact in memory.
+LINE_DTYPES = {
+    'Act': 'int8',
+    'Scene': 'int8',
+    'Line': 'int32',
+    'Player': 'category',
+    'PlayerLine': 'object'
+}
+
+# A word is a sequence of letters, digits and apostrophes
+WORD_PATTERN = r"[\w']+"
+
+# The columns of the cube, summed when grouping
+COUNT_COLUMNS = ['LineCount', 'WordCount', 'CharCount']
+
+
+def read_lines(path, with_text=False, chunksize=None):
+    '''
+        Reads the lines of a play script from a .csv file.
+
+        Only the 'Act', 'Scene', 'Line' and 'Player' columns are read,
+        unless the text of the lines is needed, in which case the
+        'PlayerLine' column is also read.
+
+        Args:
+            path: The path to the .csv file
+            with_text: Whether to read the text of the lines
+            chunksize: If given, the number of lines per chunk
+        Returns:
+            A pandas dataframe containing the lines or, if chunksize
+            is given, an iterator over dataframes of chunksize lines.
+    '''
+    columns = ['Act', 'Scene', 'Line', 'Player']
+    if with_text:
+        columns += ['PlayerLine']
+
+    return pd.read_csv(
+        path,
+        usecols=columns,
+        dtype={column: LINE_DTYPES[column] for column in columns},
+        chunksize=chunksize
+    )
+
+
+def count_lines(my_df):
+    '''
+        Counts the lines, words and characters of each player
+        in each scene.
+
+        The words and characters of every line are counted with
+        vectorized string methods, then summed in a single groupby.
+
+        Args:
+            my_df: A pandas dataframe containing lines of the play,
+                with their text
+        Returns:
+            A pandas dataframe with columns 'LineCount', 'WordCount'
+            and 'CharCount', indexed by act, scene and player.
+    '''
+    counts = my_df[['Act', 'Scene', 'Player']].assign(
+        LineCount=1,
+        WordCount=my_df['PlayerLine'].str.count(WORD_PATTERN),
+        CharCount=my_df['PlayerLine'].str.len()
+    ).groupby(by=['Act', 'Scene', 'Player'], observed=True).sum()
+    # Chunks have different player categories, so the counts use plain names
+    return counts.set_axis(counts.index.set_levels(
+        counts.index.levels[2].astype(str), level='Player'))
+
+
+def build_cube(my_df):
+    '''
+        Counts the lines, words and characters of each player
+        in each scene of the play.
+
+        The lines can be given as chunks, in which case each chunk
+        is counted on its own and only the counts are kept in memory.
+
+        Args:
+            my_df: The pandas dataframe containing the data from the .csv
+                file, or an iterable of chunks of that dataframe
+        Returns:
+            A pandas dataframe with columns 'Act', 'Scene', 'Player',
+            'LineCount', 'WordCount' and 'CharCount'.
+    '''
+    chunks = [my_df] if isinstance(my_df, pd.DataFrame) else my_df
+    # Count the lines per scene and player of each chunk, then add the counts
+    counts = pd.concat([count_lines(chunk) for chunk in chunks])
+    counts = counts.groupby(level=['Act', 'Scene', 'Player']).sum()
+    return counts.reset_index()
+
+
 def summarize_lines(my_df):
     '''
         Sums each player's total of number of lines and  its
         corresponding percentage per act.
 
         The sum of lines per player per act is in a new
-        column named 'PlayerLine'.
+        column named 'LineCount'.
 
         The percentage of lines per player per act is
-        in a new column named 'PlayerPercent'
+        in a new column named 'LinePercent'
+
+        The words and characters are also summed, in the
+        'WordCount' and 'CharCount' columns.
 
         Args:
-            my_df: The pandas dataframe containing the data from the .csv file
+            my_df: The line counts of the play, as returned by build_cube
         Returns:
             The modified pandas dataframe containing the
             information described above.
     '''
     # Group by act and player
-    my_df = my_df.groupby(by=['Act', 'Player']).count()
-    # Transform one of the columns to a LineCount column
-    my_df = my_df.rename(columns={'PlayerLine': 'LineCount'})
-    # Remove the Scene and Line column
-    my_df = my_df.drop(columns=['Scene', 'Line'])
+    my_df = my_df.groupby(by=['Act', 'Player'], observed=True)[COUNT_COLUMNS].sum()
     # Add percentage per player per act
-    my_df['LinePercent'] = (my_df['LineCount'] / my_df.groupby('Act').sum()['LineCount']) * 100
+    my_df['LinePercent'] = (my_df['LineCount'] / my_df.groupby('Act')['LineCount'].sum()) * 100
     # Ungroup the dataframe
     my_df = my_df.reset_index()
+    my_df['Player'] = my_df['Player'].astype(str)
+    return my_df
+
+
+def summarize_scenes(my_df):
+    '''
+        Sums each player's total of number of lines and its
+        corresponding percentage per scene.
+
+        The sum of lines per player per scene is in the column
+        named 'LineCount' and the percentage of lines per player
+        per scene is in a new column named 'LinePercent'. The words
+        and characters are also summed.
+
+        Args:
+            my_df: The line counts of the play, as returned by build_cube
+        Returns:
+            A pandas dataframe with columns 'Act', 'Scene', 'Player',
+            'LineCount', 'WordCount', 'CharCount' and 'LinePercent'.
+    '''
+    my_df = my_df.groupby(by=['Act', 'Scene', 'Player'], observed=True)[COUNT_COLUMNS].sum()
+    # Add percentage per player per scene
+    scene_totals = my_df.groupby(level=['Act', 'Scene'])['LineCount'].transform('sum')
+    my_df['LinePercent'] = my_df['LineCount'] / scene_totals * 100
+    my_df = my_df.reset_index()
+    my_df['Player'] = my_df['Player'].astype(str)
     return my_df
 
 
-def replace_others(my_df):
+def replace_others(my_df, top_n=5):
     '''
-        For each act, keeps the 5 players with the most lines
+        For each act, keeps the top_n players with the most lines
         throughout the play and groups the other plyaers
         together in a new line where :
 
@@ -46,40 +164,102 @@ def replace_others(my_df):
         - The 'LineCount' column contains the sum
             of the counts of lines in that act of
             all players who are not in the top
-            5 players who have the most lines in
+            top_n players who have the most lines in
             the play
         - The 'PercentCount' column contains the sum
             of the percentages of lines in that
             act of all the players who are not in the
-            top 5 players who have the most lines in
+            top top_n players who have the most lines in
             the play
+        - The 'WordCount' and 'CharCount' columns
+            contain the sums of their words and characters
 
+        Args:
+            my_df: The dataframe returned by summarize_lines
+            top_n: The number of players to keep, 5 by default
         Returns:
             The df with all players not in the top
-            5 for the play grouped as 'OTHER'
-    '''
-    # Find the top 5 players
-    top_5_index = my_df.groupby(by='Player').sum().nlargest(5, 'LineCount').index.tolist()
-    output_df = pd.DataFrame()
-    # Loop over each group:
-    for act, group in my_df.groupby(by='Act'):
-      # Keep the top 5 players
-      top_5_group = group[group['Player'].isin(top_5_index)]
-      # Group the other players
-      other_group = group[~group['Player'].isin(top_5_index)]
-      # Merge other_group into a single line
-      other_df = pd.DataFrame(data={
-        'Act': [act],
-        'Player': ['OTHER'],
-        'LineCount': [other_group['LineCount'].sum()],
-        'LinePercent': [other_group['LinePercent'].sum()],
-      })
-      # Merge top_5_group and other_df
-      combined_group = pd.concat([top_5_group, other_df], ignore_index=True)
-      # Add the group to the output_df
-      output_df = pd.concat([output_df, combined_group], ignore_index=True)
-      
-    return output_df
+            top_n for the play grouped as 'OTHER'
+    '''
+    # Find the top players
+    top_index = my_df.groupby(by='Player')['LineCount'].sum().nlargest(top_n).index
+    # Compute the mask once for every act
+    is_top = my_df['Player'].isin(top_index)
+    # Merge the other players of each act into a single line, in one aggregation.
+    # The top players count as zero, so acts without other players still
+    # get an OTHER line.
+    values = my_df[COUNT_COLUMNS + ['LinePercent']].where(~is_top, 0)
+    other_df = pd.concat([my_df[['Act']], values], axis=1) \
+        .groupby(by='Act', sort=False).sum().reset_index()
+    other_df['Player'] = 'OTHER'
+    # Put each OTHER line after the top players of its act
+    output_df = pd.concat([my_df[is_top], other_df], ignore_index=True)
+    return output_df.sort_values(by='Act', kind='mergesort', ignore_index=True)
+
+
+def rank_players(my_df, level='Act', players=None):
+    '''
+        Ranks the players by their total number of lines and
+        arranges the values of each mode as matrices,
+        with a row per player, in order of rank, and a column
+        per act or scene.
+
+        The matrices are also summed cumulatively over the players,
+        so the sum of the top N players, and thus the 'OTHER' line
+        for any N, can be read without summing again.
+
+        Args:
+            my_df: The dataframe returned by summarize_lines or
+                summarize_scenes for a single act
+            level: The column of the matrices, 'Act' or 'Scene'
+            players: The ranking of the players, if already known
+        Returns:
+            A dictionary containing the ranked players' names under
+            'players', the acts or scenes under 'x', the matrix of
+            each mode under its column's name and their cumulative
+            sums under 'cumulative'.
+    '''
+    if players is None:
+        # A stable sort keeps the same order as nlargest for equal totals
+        totals = my_df.groupby(by='Player')['LineCount'].sum()
+        players = totals.sort_values(ascending=False, kind='mergesort').index.to_numpy()
+
+    x_values = np.unique(my_df[level].to_numpy())
+    rows = pd.Index(players).get_indexer(my_df['Player'])
+    columns = np.searchsorted(x_values, my_df[level].to_numpy())
+
+    ranking = dict(players=players, x=x_values, cumulative={})
+    for column in MODE_TO_COLUMN.values():
+        matrix = np.zeros((len(players), len(x_values)), dtype=my_df[column].dtype)
+        matrix[rows, columns] = my_df[column].to_numpy()
+        ranking[column] = matrix
+        ranking['cumulative'][column] = matrix.cumsum(axis=0)
+
+    return ranking
+
+
+def get_others(ranking, top_n, column):
+    '''
+        Gets the 'OTHER' line, that is the sum of the players not
+        in the top top_n, for each act or scene of the ranking.
+
+        It is the difference between the sum of every player and the
+        sum of the top top_n players, so it only takes one operation
+        per act or scene.
+
+        Args:
+            ranking: The ranking returned by rank_players
+            top_n: The number of players not grouped as 'OTHER'
+            column: The column of the displayed mode
+        Returns:
+            The 'OTHER' line, as an array with a value per act or scene
+    '''
+    cumulative = ranking['cumulative'][column]
+    top_n = min(top_n, len(cumulative))
+
+    if top_n == 0:
+        return cumulative[-1]
+    return cumulative[-1] - cumulative[top_n - 1]
 
 
 def clean_names(my_df):
@@ -0,0 +1,110 @@
+'''
+    Contains some functions to search the text of the plays' lines.
+
+    The search is backed by an inverted index, built once, which maps
+    each word to its positions in the lines. A query only intersects a
+    few sorted arrays instead of scanning the text of every line.
+'''
+import re
+
+import numpy as np
+import pandas as pd
+
+from preprocess import WORD_PATTERN as TOKEN_PATTERN
+
+# A word's position is stored with its row as row * 2 ** POSITION_BITS + position
+POSITION_BITS = 16
+
+NO_ROWS = np.empty(0, dtype=np.int64)
+
+# A trailing possessive, removed from the words so "Romeo's" is found as "romeo"
+POSSESSIVE_PATTERN = r"'s$"
+
+
+def normalize_tokens(tokens):
+    '''
+        Normalizes words, so a word matches its possessive and
+        its quoted forms: the outer apostrophes and a trailing
+        "'s" are removed.
+
+        The text of the lines and the queries are normalized by
+        this same function, so they always match.
+
+        Args:
+            tokens: A pandas series of lowercase words
+        Returns:
+            The series of the normalized words, without the
+            ones left empty
+    '''
+    tokens = tokens.str.strip("'").str.replace(POSSESSIVE_PATTERN, '', regex=True)
+    return tokens[tokens != '']
+
+
+def tokenize(text):
+    '''
+        Splits a text into lowercase, normalized words.
+
+        Args:
+            text: The text to split
+        Returns:
+            The list of words in the text
+    '''
+    words = pd.Series(re.findall(TOKEN_PATTERN, text.lower()), dtype=object)
+    return normalize_tokens(words).tolist()
+
+
+def build_search_index(my_lines):
+    '''
+        Builds the inverted index of the lines' text.
+
+        The text is split into normalized words in a single vectorized
+        pass, then the positions of the words are grouped by word. Each position
+        is the row of the line combined with the index of the word in
+        the line, so phrases can be matched without reading the text.
+
+        Args:
+            my_lines: A pandas dataframe with a 'PlayerLine' column and
+                a default integer index
+        Returns:
+            A dictionary mapping each word to the sorted array of its
+            positions in the lines
+    '''
+    tokens = my_lines['PlayerLine'].str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    tokens = normalize_tokens(tokens)
+    tokens = pd.DataFrame({
+        'token': tokens.to_numpy(),
+        'position': (tokens.index.to_numpy(dtype=np.int64) << POSITION_BITS)
+                    + tokens.groupby(level=0).cumcount().to_numpy()
+    }).sort_values(by=['token', 'position'])
+
+    words = tokens['token'].to_numpy()
+    positions = tokens['position'].to_numpy()
+    starts = np.flatnonzero(np.r_[True, words[1:] != words[:-1]])
+
+    return dict(zip(words[starts], np.split(positions, starts[1:])))
+
+
+def find_lines(search_index, query):
+    '''
+        Finds the lines containing the given word or phrase.
+
+        The positions of the first word are shifted and intersected
+        with those of each following word, so only the positions where
+        the whole phrase starts are kept.
+
+        Args:
+            search_index: The inverted index, as returned by build_search_index
+            query: The word or phrase to find
+        Returns:
+            The sorted array of the rows of the lines containing the query
+    '''
+    words = tokenize(query or '')
+    if not words:
+        return NO_ROWS
+
+    starts = search_index.get(words[0], NO_ROWS)
+    for offset, word in enumerate(words[1:], start=1):
+        starts = np.intersect1d(starts, search_index.get(word, NO_ROWS) - offset,
+                                assume_unique=True)
+
+    return np.unique(starts >> POSITION_BITS)
@@ -0,0 +1,58 @@
+'''
+    Contains some functions related to the creation of the sequence chart.
+    The sequence chart displays which player speaks each line of a scene.
+'''
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from hover_template import get_sequence_hover_template
+
+
+def init_figure(act, scene):
+    '''
+        Initializes the Graph Object figure used to display the
+        sequence of speakers of a scene, with the same template
+        as the bar chart.
+
+        Args:
+            act: The act containing the scene
+            scene: The displayed scene
+        Returns:
+            fig: The figure which will display the sequence chart
+    '''
+    fig = go.Figure()
+
+    fig.update_layout(
+        title='Speakers of act {} scene {}'.format(act, scene),
+        template=pio.templates['my_custom_theme'],
+        dragmode=False,
+        showlegend=False,
+        xaxis_title='Line',
+        yaxis_type='category'
+    )
+
+    return fig
+
+
+def draw(fig, data):
+    '''
+        Draws the sequence chart, with a marker for each line
+        of the scene at the height of the player who speaks it.
+
+        Args:
+            fig: The figure comprising the sequence chart
+            data: The lines of the scene, with columns 'Line' and 'Player'
+        Returns:
+            fig: The figure comprising the drawn sequence chart
+    '''
+    fig.add_trace(go.Scatter(
+        name='Lines',
+        x=data['Line'],
+        y=data['Player'],
+        mode='markers',
+        marker_symbol='square',
+        hovertemplate=get_sequence_hover_template()
+    ))
+
+    return fig
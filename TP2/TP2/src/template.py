@@ -17,7 +17,9 @@ THEME = {
     'font_family': 'Montserrat',
     'font_color': '#898989',
     'label_font_size': 16,
-    'label_background_color': '#ffffff'
+    'label_background_color': '#ffffff',
+    'highlight_color': '#000000',
+    'highlight_width': 3
 }
 
 
@@ -10,42 +10,446 @@
     This file is the entry point for our dash app.
 '''
 
+import calendar
+import functools
+
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from flask import jsonify
 
-import pandas as pd
+import numpy as np
 
+import cache
+import downsample
 import preprocess
 import heatmap
 import line_chart
 import template
 
+from resolutions import HEATMAP_RESOLUTIONS, RESOLUTIONS
+
 
 app = dash.Dash(__name__)
 app.title = 'TP3 | INF8808'
 
-dataframe = pd.read_csv('./assets/data/arbres.csv')
+DATA_PATH = './assets/data/arbres.csv'
+# The counts of the inventory are kept here between runs
+CACHE_DIR = './cache'
+# The number of rows of the inventory read at once
+CHUNKSIZE = 200000
+# The number of line charts kept in memory
+LINE_CHART_CACHE_SIZE = 256
+# Longer series are downsampled to this number of points in the line chart
+MAX_LINE_POINTS = 500
+# The range of years displayed when the app is opened
+DEFAULT_YEARS = [2010, 2020]
+# How often the inventory is checked for appended rows, in milliseconds
+REFRESH_INTERVAL = 60 * 1000
+
+
+def build_trees(daily_trees, offset):
+    '''
+        Builds the counts answering the filters from the counts
+        of the trees planted per neighborhood, day and species.
+
+        Args:
+            daily_trees: The counts of the inventory's trees
+            offset: The position in the inventory's file where
+                the counted rows end
+        Returns:
+            A dictionary containing the given counts and offset,
+            the count cube under 'count_cube' and the daily
+            counts under 'daily_counts'
+    '''
+    return dict(
+        daily_trees=daily_trees,
+        offset=offset,
+        count_cube=preprocess.build_count_cube(daily_trees),
+        daily_counts=preprocess.summarize_daily_counts(daily_trees)
+    )
+
+
+# Every filter is answered from these counts, the rows are never kept
+trees = build_trees(*cache.load_daily_trees(DATA_PATH, CACHE_DIR, CHUNKSIZE))
+# The counts cover every year, the displayed range is selected from them
+yearly_counts = preprocess.filter_counts(trees['count_cube'])
+data = preprocess.select_years(yearly_counts, *DEFAULT_YEARS)
+
+
+def refresh_trees():
+    '''
+        Adds the counts of the rows appended to the inventory
+        since it was last read, without reading it again.
+
+        The cached line charts and heatmaps are cleared,
+        since they may not match the new counts.
+
+        Returns:
+            Whether the counts changed
+    '''
+    daily_trees, offset = cache.refresh_daily_trees(
+        DATA_PATH, CACHE_DIR, trees['daily_trees'], trees['offset'], CHUNKSIZE)
+    if daily_trees is None:
+        return False
+
+    trees.update(build_trees(daily_trees, offset))
+    get_line_chart.cache_clear()
+    get_comparison_chart.cache_clear()
+    get_heatmap_counts.cache_clear()
+    get_year_heatmap.cache_clear()
+    return True
+
+
+def get_filter_key(values):
+    '''
+        Gets the value of a filter in a form usable as a cache key.
+
+        Args:
+            values: The selected values, if any
+        Returns:
+            The sorted values as a tuple, or None if
+            no value is selected
+    '''
+    return tuple(sorted(values)) if values else None
+
+
+def get_filters(species, months):
+    '''
+        Gets the filters of the counts from the selected
+        species and months, in a form usable as a cache key.
+
+        Args:
+            species: The selected species, if any
+            months: The selected months, if any
+        Returns:
+            The (species, months) pair of filters, as expected
+            by preprocess
+    '''
+    return get_filter_key(species), get_filter_key(months)
+
+
+@functools.lru_cache(maxsize=LINE_CHART_CACHE_SIZE)
+def get_line_chart(arrond, year, filters=preprocess.NO_FILTERS,
+                   resolution=RESOLUTIONS['day'], all_years=False):
+    '''
+        Gets the line chart of the given neighborhood and year.
+
+        The most recently used line charts are kept in memory,
+        so a cell clicked again is not drawn again.
+
+        Series longer than MAX_LINE_POINTS, such as the days of
+        every year, are downsampled while keeping their shape.
+
+        Args:
+            arrond: The neighborhood
+            year: The year
+            filters: The displayed species and months, as
+                returned by get_filters
+            resolution: The resolution, one of RESOLUTIONS
+            all_years: Whether to display every year rather
+                than only the given one
+        Returns:
+            The line chart's figure
+    '''
+    years = trees['daily_counts']['days'][[0, -1]].year
+    first_year, last_year = years if all_years else (year, year)
+    line_data = preprocess.get_series(trees['daily_counts'], arrond, (first_year, last_year),
+                                      resolution, filters)
+    if len(line_data) == 0:
+        return EMPTY_FIGURE
+
+    period = 'from {} to {}'.format(first_year, last_year) if all_years else year
+    return line_chart.get_figure(downsample_series(line_data), arrond, period,
+                                 line_chart.get_tick_format(resolution, all_years))
+
+
+def downsample_series(line_data):
+    '''
+        Downsamples the series to MAX_LINE_POINTS points,
+        if it is longer, while keeping its shape.
+
+        Args:
+            line_data: The series, as returned by preprocess.get_series
+        Returns:
+            The downsampled series
+    '''
+    if len(line_data) <= MAX_LINE_POINTS:
+        return line_data
+
+    days = line_data['Date_Plantation'].values.astype('datetime64[D]').astype(np.int64)
+    return line_data.iloc[downsample.lttb(days, line_data['Counts'], MAX_LINE_POINTS)]
+
+
+@functools.lru_cache(maxsize=LINE_CHART_CACHE_SIZE)
+def get_comparison_chart(cells, filters=preprocess.NO_FILTERS,
+                         resolution=RESOLUTIONS['day'], all_years=False):
+    '''
+        Gets the line chart overlaying the series of the
+        selected neighborhoods and years.
+
+        The series are fetched together, by
+        preprocess.get_series_batch. The most recently used
+        charts are kept in memory, like the line charts.
+
+        Args:
+            cells: The selected (neighborhood, year) pairs, as
+                a tuple
+            filters: The displayed species and months, as
+                returned by get_filters
+            resolution: The resolution, one of RESOLUTIONS
+            all_years: Whether to display every year of the
+                selected neighborhoods
+        Returns:
+            The line chart's figure
+    '''
+    series = preprocess.get_series_batch(trees['daily_counts'], cells, resolution,
+                                         filters, all_years)
+    series = [(arrond, year, downsample_series(line_data))
+              for arrond, year, line_data in series if len(line_data) > 0]
+    if not series:
+        return EMPTY_FIGURE
+
+    return line_chart.get_comparison_figure(series,
+                                            line_chart.get_tick_format(resolution, all_years))
+
+
+@functools.lru_cache(maxsize=16)
+def get_heatmap_counts(first_year, last_year, resolution, filters=preprocess.NO_FILTERS):
+    '''
+        Gets the counts of the image heatmap, per neighborhood
+        and day or week.
+
+        The last few are kept in memory, so looking up the
+        hovered cells does not sum them again.
+
+        Args:
+            first_year: The first displayed year
+            last_year: The last displayed year
+            resolution: The resolution, 'Day' or 'Week'
+            filters: The displayed species and months, as
+                returned by get_filters
+        Returns:
+            The counts and dates, as returned by
+            preprocess.get_bucket_counts
+    '''
+    return preprocess.get_bucket_counts(trees['daily_counts'], (first_year, last_year),
+                                        resolution, filters)
+
+
+@functools.lru_cache(maxsize=16)
+def get_year_heatmap(first_year, last_year, filters=preprocess.NO_FILTERS):
+    '''
+        Gets the heatmap with a cell per neighborhood and year,
+        serialized as a dictionary.
+
+        The last few are kept in memory, so the default heatmap,
+        drawn for the layout, is served again without being
+        built or serialized when the page is loaded.
+
+        Args:
+            first_year: The first displayed year
+            last_year: The last displayed year
+            filters: The displayed species and months, as
+                returned by get_filters
+        Returns:
+            The heatmap's figure, as a dictionary
+    '''
+    filtered_counts = preprocess.filter_counts(trees['count_cube'], filters)
+    yearly_data = preprocess.select_years(filtered_counts, first_year, last_year)
+    return heatmap.get_figure(yearly_data).to_dict()
+
+
+def get_heatmap_figure(years, resolution, filters=preprocess.NO_FILTERS):
+    '''
+        Draws the heatmap of the given years, either with a
+        cell per neighborhood and year or as an image with a
+        pixel per neighborhood and day or week.
+
+        Args:
+            years: The first and last displayed years
+            resolution: The resolution, one of HEATMAP_RESOLUTIONS
+            filters: The displayed species and months, as
+                returned by get_filters
+        Returns:
+            The heatmap's figure
+    '''
+    if resolution == HEATMAP_RESOLUTIONS['year']:
+        return get_year_heatmap(years[0], years[1], filters)
+
+    counts, dates = get_heatmap_counts(years[0], years[1], resolution, filters)
+    return heatmap.get_image_figure(counts, trees['daily_counts']['neighborhoods'], dates)
+
+
+def get_clicked_cell(point, resolution, years, filters=preprocess.NO_FILTERS):
+    '''
+        Gets the neighborhood, year and count of the heatmap's
+        cell under a hovered or clicked point.
+
+        Args:
+            point: The point of the hover or click data
+            resolution: The heatmap's resolution, one of HEATMAP_RESOLUTIONS
+            years: The first and last displayed years
+            filters: The displayed species and months, as
+                returned by get_filters
+        Returns:
+            A dictionary containing the neighborhood under 'arrond',
+            the year under 'year', the first day of the cell under
+            'date' and the count under 'count', or None if the point
+            is outside of the heatmap
+    '''
+    if resolution == HEATMAP_RESOLUTIONS['year']:
+        return dict(arrond=point['y'], year=point['x'], date=None, count=point['z'])
+
+    counts, dates = get_heatmap_counts(years[0], years[1], resolution, filters)
+    cell = heatmap.get_image_cell(point, *counts.shape)
+    if cell is None:
+        return None
+
+    row, column = cell
+    return dict(arrond=trees['daily_counts']['neighborhoods'][row],
+                year=int(dates[column].year),
+                date=dates[column].strftime('%d %b %Y'),
+                count=int(counts[row, column]))
+
+
+def warm_up_line_charts(heatmap_data):
+    '''
+        Draws the line chart of every cell of the heatmap
+        with planted trees, so they are in memory before
+        the first click.
+
+        Args:
+            heatmap_data: The data displayed in the heatmap
+    '''
+    rows, columns = heatmap_data.to_numpy().nonzero()
+    for arrond, year in zip(heatmap_data.index[rows], heatmap_data.columns[columns]):
+        # The arguments are those of a click, so the click finds them in the cache
+        get_line_chart(arrond, int(year), preprocess.NO_FILTERS, RESOLUTIONS['day'], False)
+
+
+def get_cache_stats():
+    '''
+        Gets the statistics of the line charts' cache.
+
+        Every line chart added to a full cache evicts
+        the least recently used one, so the number of
+        evictions is the number of misses which did not
+        stay in the cache.
+
+        Returns:
+            A dictionary containing the number of hits,
+            misses and evictions, as well as the current
+            and maximum sizes of the cache
+    '''
+    info = get_line_chart.cache_info()
+    return dict(
+        hits=info.hits,
+        misses=info.misses,
+        evictions=info.misses - info.currsize,
+        size=info.currsize,
+        max_size=info.maxsize
+    )
+
+
+def get_subtitle(years):
+    '''
+        Gets the subtitle describing the displayed range of years.
+
+        Args:
+            years: The first and last displayed years
+        Returns:
+            The subtitle
+    '''
+    return 'From {} to {}'.format(*years)
 
-dataframe = preprocess.convert_dates(dataframe)
-dataframe = preprocess.filter_years(dataframe, 2010, 2020)
-yearly_df = preprocess.summarize_yearly_counts(dataframe)
-data = preprocess.restructure_df(yearly_df)
 
 template.create_custom_theme()
 template.set_default_theme()
 
+# Displayed when there is no data to show, built once
+EMPTY_FIGURE = line_chart.add_rectangle_shape(line_chart.get_empty_figure())
+warm_up_line_charts(data)
+
 app.layout = html.Div(className='content', children=[
     html.Header(children=[
         html.H1('Trees planted in Montreal neighborhoods'),
-        html.H2('From 2010 to 2020')
+        html.H2(id='subtitle', children=get_subtitle(DEFAULT_YEARS)),
+        html.P(id='heatmap-hover', className='hover-info'),
+        html.Div(className='year-range', children=[
+            dcc.RangeSlider(
+                id='year-slider',
+                min=trees['count_cube']['years'].min(),
+                max=trees['count_cube']['years'].max(),
+                step=1,
+                value=DEFAULT_YEARS,
+                marks={
+                    int(year): str(year)
+                    for year in trees['count_cube']['years']
+                    if year % 5 == 0
+                },
+                allowCross=False
+            )
+        ]),
+        html.Div(className='filters', children=[
+            dcc.RadioItems(
+                id='heatmap-resolution',
+                className='filter',
+                options=[
+                    dict(label=resolution, value=resolution)
+                    for resolution in HEATMAP_RESOLUTIONS.values()
+                ],
+                value=HEATMAP_RESOLUTIONS['year']
+            ),
+            dcc.Dropdown(
+                id='species-dropdown',
+                className='filter',
+                options=[
+                    dict(label=species, value=species)
+                    for species in trees['count_cube']['species']
+                ],
+                multi=True,
+                placeholder='All species'
+            ),
+            dcc.Dropdown(
+                id='month-dropdown',
+                className='filter',
+                options=[
+                    dict(label=calendar.month_name[month], value=month)
+                    for month in range(1, 13)
+                ],
+                multi=True,
+                placeholder='All months'
+            ),
+            dcc.RadioItems(
+                id='resolution-items',
+                className='filter',
+                options=[
+                    dict(label=resolution, value=resolution)
+                    for resolution in RESOLUTIONS.values()
+                ],
+                value=RESOLUTIONS['day']
+            ),
+            dcc.Checklist(
+                id='history-check',
+                className='filter',
+                options=[dict(label='All years', value='all')],
+                value=[]
+            ),
+            dcc.Checklist(
+                id='compare-check',
+                className='filter',
+                options=[dict(label='Compare', value='compare')],
+                value=[]
+            )
+        ])
     ]),
     html.Main(className='viz-container', children=[
         dcc.Graph(
             id='heatmap',
             className='graph',
-            figure=heatmap.get_figure(data),
+            figure=get_year_heatmap(*DEFAULT_YEARS),
             config=dict(
                 scrollZoom=False,
                 showTips=False,
@@ -57,7 +461,7 @@ app.layout = html.Div(className='content', children=[
         dcc.Graph(
             id='line-chart',
             className='graph',
-            figure=line_chart.get_empty_figure(),
+            figure=EMPTY_FIGURE,
             config=dict(
                 scrollZoom=False,
                 showTips=False,
@@ -66,20 +470,167 @@ app.layout = html.Div(className='content', children=[
                 displayModeBar=False
             )
         )
-    ])
+    ]),
+    dcc.Interval(id='refresh-interval', interval=REFRESH_INTERVAL),
+    dcc.Store(id='trees-version', data=trees['offset']),
+    dcc.Store(id='selected-cells', data=[])
 ])
 
 
+@app.callback(
+    [Output('heatmap', 'figure'),
+     Output('subtitle', 'children'),
+     Output('trees-version', 'data')],
+    [Input('year-slider', 'value'),
+     Input('species-dropdown', 'value'),
+     Input('month-dropdown', 'value'),
+     Input('heatmap-resolution', 'value'),
+     Input('refresh-interval', 'n_intervals')],
+    [State('trees-version', 'data')],
+    prevent_initial_call=True
+)
+def years_updated(years, species, months, resolution,  # pylint: disable=too-many-arguments
+                  n_intervals, version):  # pylint: disable=unused-argument
+    '''
+        When the range of years, the filters or the heatmap's
+        resolution are changed, updates the heatmap to show
+        the matching counts.
+
+        The counts are summed from the count cube and sliced
+        by year, so the data is not filtered again. At the day
+        or week resolution, they are summed from the daily
+        counts and the heatmap is drawn as an image.
+
+        On each tick of the refresh interval, the rows appended
+        to the inventory are counted. Whenever the counts differ
+        from the version displayed by this client, whichever
+        client's tick counted the rows, the heatmap is drawn
+        again and the version is updated, so the line chart is
+        also drawn again.
+
+        Args:
+            years: The first and last years to display
+            species: The species to display, if any
+            months: The months to display, if any
+            resolution: The heatmap's resolution
+            n_intervals: The number of ticks of the refresh interval
+            version: The version of the counts displayed by the client
+        Returns:
+            The heatmap's figure, the subtitle and the version
+            of the counts
+    '''
+    if dash.callback_context.triggered[0]['prop_id'].split('.')[0] == 'refresh-interval':
+        refresh_trees()
+        if version == trees['offset']:
+            return dash.no_update, dash.no_update, dash.no_update
+
+    version = dash.no_update if version == trees['offset'] else trees['offset']
+
+    return (get_heatmap_figure(years, resolution, get_filters(species, months)),
+            get_subtitle(years), version)
+
+
+@app.callback(
+    Output('selected-cells', 'data'),
+    [Input('heatmap', 'clickData')],
+    [State('heatmap-resolution', 'value'),
+     State('year-slider', 'value'),
+     State('species-dropdown', 'value'),
+     State('month-dropdown', 'value'),
+     State('compare-check', 'value'),
+     State('selected-cells', 'data')],
+    prevent_initial_call=True
+)
+def heatmap_clicked(click_data, resolution, years,  # pylint: disable=too-many-arguments
+                    species, months, compare, cells):
+    '''
+        When a cell in the heatmap is clicked, selects its
+        neighborhood and year.
+
+        When 'Compare' is checked, the clicked cell is added
+        to the selected cells, or removed if it was already
+        selected. Otherwise, it replaces them.
+
+        Args:
+            click_data: The clicked point
+            resolution: The heatmap's resolution
+            years: The first and last displayed years
+            species: The displayed species, if any
+            months: The displayed months, if any
+            compare: Whether 'Compare' is checked
+            cells: The selected cells
+        Returns:
+            The selected cells, as [neighborhood, year] pairs
+    '''
+    cell = get_clicked_cell(click_data['points'][0], resolution, years,
+                            get_filters(species, months))
+    if cell is None:
+        return dash.no_update
+
+    cell = [cell['arrond'], cell['year']]
+    if 'compare' not in compare:
+        return [cell]
+    if cell in cells:
+        return [selected for selected in cells if selected != cell]
+    return cells + [cell]
+
+
+@app.callback(
+    Output('heatmap-hover', 'children'),
+    [Input('heatmap', 'hoverData')],
+    [State('heatmap-resolution', 'value'),
+     State('year-slider', 'value'),
+     State('species-dropdown', 'value'),
+     State('month-dropdown', 'value')],
+    prevent_initial_call=True
+)
+def heatmap_hovered(hover_data, resolution, years, species, months):
+    '''
+        When a cell of the image heatmap is hovered, displays
+        its neighborhood, date and count, looked up in the
+        counts the image was drawn from.
+
+        Args:
+            hover_data: The hovered point
+            resolution: The heatmap's resolution
+            years: The first and last displayed years
+            species: The displayed species, if any
+            months: The displayed months, if any
+        Returns:
+            The description of the hovered cell
+    '''
+    if hover_data is None or resolution == HEATMAP_RESOLUTIONS['year']:
+        return ''
+
+    cell = get_clicked_cell(hover_data['points'][0], resolution, years,
+                            get_filters(species, months))
+    if cell is None:
+        return ''
+    return '{arrond}, {date} : {count} trees'.format(**cell)
+
+
 @app.callback(
     Output('line-chart', 'figure'),
-    [Input('heatmap', 'clickData')]
+    [Input('selected-cells', 'data'),
+     Input('species-dropdown', 'value'),
+     Input('month-dropdown', 'value'),
+     Input('resolution-items', 'value'),
+     Input('history-check', 'value'),
+     Input('trees-version', 'data')]
 )
-def heatmap_clicked(click_data):
+def cells_selected(cells, species, months, resolution,  # pylint: disable=too-many-arguments
+                   history, version):  # pylint: disable=unused-argument
     '''
-        When a cell in the heatmap is clicked, updates the
+        When a cell in the heatmap is selected, updates the
         line chart to show the data for the corresponding
         neighborhood and year. If there is no data to show,
-        displays a message.
+        displays a message. When several cells are selected,
+        their series are overlaid.
+
+        The line chart is also updated when the filters,
+        the resolution or the counts are changed. When 'All
+        years' is checked, it shows every year of the
+        selected neighborhoods.
 
         Args:
             The necessary inputs and states to update the
@@ -88,19 +639,24 @@ def heatmap_clicked(click_data):
             The necessary output values to update the line
             chart.
     '''
-    if click_data is None or click_data['points'][0]['z'] == 0:
-        fig = line_chart.get_empty_figure()
-        line_chart.add_rectangle_shape(fig)
-        return fig
+    if not cells:
+        return EMPTY_FIGURE
 
-    arrond = click_data['points'][0]['y']
-    year = click_data['points'][0]['x']
+    if len(cells) == 1:
+        arrond, year = cells[0]
+        return get_line_chart(arrond, year, get_filters(species, months),
+                              resolution, 'all' in history)
 
-    line_data = preprocess.get_daily_info(
-        dataframe,
-        arrond,
-        year)
+    return get_comparison_chart(tuple(tuple(cell) for cell in cells), get_filters(species, months),
+                                resolution, 'all' in history)
 
-    line_fig = line_chart.get_figure(line_data, arrond, year)
 
-    return line_fig
+@app.server.route('/cache-stats')
+def cache_stats():
+    '''
+        Serves the statistics of the line charts' cache.
+
+        Returns:
+            The statistics, as JSON
+    '''
+    return jsonify(get_cache_stats())
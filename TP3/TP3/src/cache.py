@@ -0,0 +1,215 @@
+'''
+    Contains some functions to cache the counts of the tree inventory
+    on disk.
+
+    The trees planted per neighborhood, day and species are stored in a
+    Feather file, with the dates already parsed and the neighborhoods
+    and species as categories. The file is named after the size and
+    modification time of the .csv file, so the inventory is only read
+    again when the file changes.
+
+    Rows appended to the file are read on their own, starting from the
+    offset where the previous read stopped, and their counts are added
+    to the cached ones. An appended row is only read once its line is
+    complete, so a row being written is left for the next read.
+'''
+import glob
+import io
+import os
+
+import pandas as pd
+
+import preprocess
+
+
+# The number of bytes read at a time when looking for the last complete row
+BLOCK_SIZE = 2 ** 16
+
+# Changed whenever the cached columns change
+CACHE_VERSION = 3
+
+
+def get_cache_key(path):
+    '''
+        Gets a key identifying the current version of a file.
+
+        Args:
+            path: The path to the file
+        Returns:
+            A string made of the file's name, size and
+            modification time, and of the cache's version
+    '''
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return '{}-{}-{}-v{}'.format(name, stat.st_size, stat.st_mtime_ns, CACHE_VERSION)
+
+
+class ByteRange(io.RawIOBase):
+    '''
+        A readable view of an open file which stops at the given
+        position, so the rows after it are not parsed.
+    '''
+
+    def __init__(self, source, end):
+        super().__init__()
+        self.source = source
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.end - self.source.tell())
+        if size <= 0:
+            return 0
+        data = self.source.read(size)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def get_rows_end(source):
+    '''
+        Finds the end of the last complete row of an open file,
+        reading it backwards by blocks.
+
+        Args:
+            source: The file, open in binary mode
+        Returns:
+            The position following the last line break of the
+            file, or 0 if it has none
+    '''
+    end = source.seek(0, os.SEEK_END)
+    while end > 0:
+        start = max(0, end - BLOCK_SIZE)
+        source.seek(start)
+        position = source.read(end - start).rfind(b'\n')
+        if position >= 0:
+            return start + position + 1
+        end = start
+    return 0
+
+
+def read_daily_trees(path, offset=0, chunksize=None):
+    '''
+        Streams the rows of the .csv file which start at the given
+        offset, and counts them with preprocess.count_daily_trees.
+
+        The whole file is read up to its end. Rows read from an
+        offset stop at the last line break instead, so an appended
+        row which is still being written is neither parsed nor counted.
+
+        Args:
+            path: The path to the .csv file
+            offset: The position in the file of the first row to read,
+                0 to read the whole file
+            chunksize: The number of rows per chunk when reading the file
+        Returns:
+            daily_trees: The counts of the rows, or None if there
+                is no complete row after the offset
+            offset: The position in the file where the counted rows end
+    '''
+    # Rows after the offset have no header, so it is read beforehand
+    names = None if offset == 0 else pd.read_csv(path, nrows=0).columns.tolist()
+
+    with open(path, 'rb') as source:
+        end = source.seek(0, os.SEEK_END) if offset == 0 else get_rows_end(source)
+        if end <= offset:
+            return None, offset
+
+        source.seek(offset)
+        rows = io.BufferedReader(ByteRange(source, end))
+        chunks = preprocess.read_trees(rows, chunksize=chunksize, names=names)
+        return preprocess.count_daily_trees(chunks), end
+
+
+def save_daily_trees(path, cache_dir, daily_trees, offset):
+    '''
+        Caches the counts of the .csv file's rows.
+
+        The counts are only cached if they cover the whole file,
+        since they are found again from the file's size. The
+        counts cached for the file's previous versions are removed.
+
+        Args:
+            path: The path to the .csv file
+            cache_dir: The directory containing the cached counts
+            daily_trees: The counts of the file's rows
+            offset: The position in the file where the reading stopped
+    '''
+    if os.path.getsize(path) != offset:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, get_cache_key(path) + '.feather')
+    daily_trees.to_feather(cache_path)
+
+    # The counts of the file's previous versions are no longer needed
+    name = os.path.splitext(os.path.basename(path))[0]
+    for old_path in glob.glob(os.path.join(cache_dir, name + '-*.feather')):
+        if old_path != cache_path:
+            os.remove(old_path)
+
+
+def load_daily_trees(path, cache_dir, chunksize=None):
+    '''
+        Gets the counts of the tree inventory, as returned by
+        preprocess.count_daily_trees.
+
+        They are read from the cache if the .csv file has not changed
+        since it was last read, otherwise the file is streamed by
+        chunks, which are folded into the counts, and the counts are
+        cached. Feather files are memory-mapped when read, so loading
+        the cache does not parse anything.
+
+        Args:
+            path: The path to the .csv file
+            cache_dir: The directory containing the cached counts
+            chunksize: The number of rows per chunk when reading the file
+        Returns:
+            daily_trees: A pandas dataframe with columns 'Arrond_Nom',
+                'Date_Plantation', preprocess.SPECIES_COLUMN and 'Counts'
+            offset: The position in the file where the counted rows end
+    '''
+    cache_path = os.path.join(cache_dir, get_cache_key(path) + '.feather')
+
+    if os.path.exists(cache_path):
+        return pd.read_feather(cache_path), os.path.getsize(path)
+
+    daily_trees, offset = read_daily_trees(path, chunksize=chunksize)
+    save_daily_trees(path, cache_dir, daily_trees, offset)
+    return daily_trees, offset
+
+
+def refresh_daily_trees(path, cache_dir, daily_trees, offset, chunksize=None):
+    '''
+        Updates the counts of the tree inventory with the rows
+        appended to the .csv file since it was last read.
+
+        Only the appended rows are read. If the file is smaller
+        than when it was last read, it was rewritten rather than
+        appended to, so it is loaded again.
+
+        Args:
+            path: The path to the .csv file
+            cache_dir: The directory containing the cached counts
+            daily_trees: The current counts
+            offset: The position in the file where the counted rows end
+            chunksize: The number of rows per chunk when reading the file
+        Returns:
+            daily_trees: The updated counts, or None if no complete
+                row was appended to the file
+            offset: The position in the file where the counted rows end
+    '''
+    size = os.path.getsize(path)
+    if size == offset:
+        return None, offset
+    if size < offset:
+        return load_daily_trees(path, cache_dir, chunksize)
+
+    new_trees, offset = read_daily_trees(path, offset, chunksize)
+    if new_trees is None:
+        return None, offset
+
+    daily_trees = preprocess.add_daily_trees(daily_trees, new_trees)
+    save_daily_trees(path, cache_dir, daily_trees, offset)
+    return daily_trees, offset
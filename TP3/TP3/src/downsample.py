@@ -0,0 +1,50 @@
+'''
+    Contains the downsampling of the line chart's series.
+
+    The Largest-Triangle-Three-Buckets algorithm splits the points in
+    buckets and keeps, in each bucket, the point forming the largest
+    triangle with the point kept in the previous bucket and the average
+    of the next bucket. The peaks of the series are kept, so its shape
+    is preserved with far fewer points.
+'''
+import numpy as np
+
+
+def lttb(x_values, y_values, nb_of_pts):
+    '''
+        Selects the points to keep to draw the series
+        with the given number of points.
+
+        Args:
+            x_values: The x coordinates of the series, in increasing order
+            y_values: The y coordinates of the series
+            nb_of_pts: The number of points to keep
+        Returns:
+            The sorted indices of the kept points, every
+            index if the series is short enough
+    '''
+    length = len(x_values)
+    if nb_of_pts >= length or nb_of_pts < 3:
+        return np.arange(length)
+
+    x_values = np.asarray(x_values, dtype=np.float64)
+    y_values = np.asarray(y_values, dtype=np.float64)
+
+    # The first and last points are always kept, the others are split in buckets
+    edges = np.linspace(1, length - 1, nb_of_pts - 1).astype(np.int64)
+    edges = np.append(edges, length)
+
+    selected = np.empty(nb_of_pts, dtype=np.int64)
+    selected[0], selected[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(nb_of_pts - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_x = x_values[end:edges[bucket + 2]].mean()
+        next_y = y_values[end:edges[bucket + 2]].mean()
+
+        areas = np.abs((x_values[previous] - next_x) * (y_values[start:end] - y_values[previous])
+                       - (x_values[previous] - x_values[start:end]) * (next_y - y_values[previous]))
+        previous = start + np.argmax(areas)
+        selected[bucket + 1] = previous
+
+    return selected
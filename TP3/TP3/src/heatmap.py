@@ -1,8 +1,17 @@
 '''
     Contains some functions related to the creation of the heatmap.
 '''
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+
 import hover_template
+import image
+
+from template import THEME
+
+# The height of the image heatmap, relative to its width
+IMAGE_ASPECT_RATIO = 0.6
 
 
 def get_figure(data):
@@ -31,4 +40,85 @@ def get_figure(data):
     fig.update_traces(hovertemplate=hover_template.get_heatmap_hover_template())
 
     return fig
-    
\ No newline at end of file
+    
+
+def get_row_height(nb_of_rows, nb_of_columns):
+    '''
+        Gets the height of a row of the image heatmap, in
+        units of the x axis.
+
+        Plotly draws images with square units, so the rows
+        are stretched for the image to keep its aspect ratio.
+
+        Args:
+            nb_of_rows: The number of neighborhoods
+            nb_of_columns: The number of days or weeks
+        Returns:
+            The height of a row
+    '''
+    return nb_of_columns * IMAGE_ASPECT_RATIO / nb_of_rows
+
+
+def get_image_figure(counts, neighborhoods, dates):
+    '''
+        Generates the heatmap of the given daily or weekly
+        counts as an image.
+
+        The counts are rendered on the server as a PNG image,
+        with a pixel per cell colored with the theme's colorscale,
+        so the figure's size is bounded by its number of pixels.
+        The image has no hover labels, the hovered cell is looked
+        up with get_image_cell instead.
+
+        Args:
+            counts: The neighborhood X day or week matrix of counts
+            neighborhoods: The neighborhoods
+            dates: The first day of each column
+        Returns:
+            The figure to be displayed.
+    '''
+    max_count = max(int(counts.max()), 1) if counts.size else 1
+    colors = image.get_colors(THEME['colorscale'])
+    source = image.to_data_uri(image.encode_png(image.render(counts, colors, max_count)))
+    row_height = get_row_height(len(neighborhoods), len(dates))
+
+    # The first column of each year is labeled with the year
+    years = np.flatnonzero(np.r_[True, dates.year[1:] != dates.year[:-1]])
+
+    fig = go.Figure([
+        go.Image(source=source, dx=1, dy=row_height, hoverinfo='none'),
+        # Only displays the color bar of the image's colorscale
+        go.Scatter(
+            x=[None], y=[None], mode='markers', hoverinfo='skip',
+            marker=dict(
+                colorscale=THEME['colorscale'], cmin=0, cmax=max_count,
+                showscale=True, colorbar=dict(title='Trees')
+            )
+        )
+    ])
+    fig.update_xaxes(tickvals=years, ticktext=dates.year[years].astype(str), showgrid=False)
+    fig.update_yaxes(tickvals=np.arange(len(neighborhoods)) * row_height,
+                     ticktext=list(neighborhoods), showgrid=False)
+    fig.update_layout(dragmode=False, showlegend=False)
+
+    return fig
+
+
+def get_image_cell(point, nb_of_rows, nb_of_columns):
+    '''
+        Gets the cell of the image heatmap under a hovered
+        or clicked point.
+
+        Args:
+            point: The point of the hover or click data
+            nb_of_rows: The number of neighborhoods
+            nb_of_columns: The number of days or weeks
+        Returns:
+            The row and column of the cell, or None if the
+            point is outside of the image
+    '''
+    row = int(round(point['y'] / get_row_height(nb_of_rows, nb_of_columns)))
+    column = int(round(point['x']))
+    if not (0 <= row < nb_of_rows and 0 <= column < nb_of_columns):
+        return None
+    return row, column
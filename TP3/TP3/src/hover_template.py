@@ -37,3 +37,23 @@ def get_linechart_hover_template():
     trees = "<span style=\"font-family:'Roboto Slab'; font-weight: bold\">Trees: </span><span style=\"font-family:'Roboto'; font-weight: normal\">%{y}</span><br>"
 
     return date + trees + "<extra></extra>"
+
+
+def get_comparison_hover_template():
+    '''
+        Sets the template for the hover tooltips in the
+        line chart comparing several series.
+
+        Contains three labels, followed by their corresponding
+        value, separated by a colon : series, date and trees
+        planted. The date is the actual date of the point,
+        given as custom data.
+
+        The labels are font 'Roboto Slab' and bold. The values
+        are font 'Roboto' and regular weight.
+    '''
+    series = "<span style=\"font-family:'Roboto Slab'; font-weight: bold\">Series: </span><span style=\"font-family:'Roboto'; font-weight: normal\">%{fullData.name}</span><br>"
+    date = "<span style=\"font-family:'Roboto Slab'; font-weight: bold\">Date: </span><span style=\"font-family:'Roboto'; font-weight: normal\">%{customdata}</span><br>"
+    trees = "<span style=\"font-family:'Roboto Slab'; font-weight: bold\">Trees: </span><span style=\"font-family:'Roboto'; font-weight: normal\">%{y}</span><br>"
+
+    return series + date + trees + "<extra></extra>"
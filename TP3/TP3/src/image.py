@@ -0,0 +1,99 @@
+'''
+    Contains some functions to render a matrix of counts as a PNG image.
+
+    The image is encoded on the server, with a row of pixels per row of
+    the matrix, so its size depends on the number of pixels rather than
+    on the size of the numbers sent in a JSON matrix.
+'''
+import base64
+import struct
+import zlib
+
+import numpy as np
+import plotly.colors
+
+
+def get_colors(colorscale, nb_of_colors=256):
+    '''
+        Samples the named plotly colorscale.
+
+        Args:
+            colorscale: The name of a sequential plotly colorscale
+            nb_of_colors: The number of colors to sample
+        Returns:
+            A nb_of_colors X 3 array of RGB colors, from
+            the lowest to the highest value
+    '''
+    colors, _ = plotly.colors.convert_colors_to_same_type(
+        getattr(plotly.colors.sequential, colorscale), 'rgb')
+    colors = np.array([plotly.colors.unlabel_rgb(color) for color in colors])
+    positions = np.linspace(0, 1, len(colors))
+    samples = np.linspace(0, 1, nb_of_colors)
+
+    return np.stack([np.interp(samples, positions, colors[:, channel])
+                     for channel in range(3)], axis=1).round().astype(np.uint8)
+
+
+def render(matrix, colors, max_value):
+    '''
+        Maps each value of the matrix to a color, linearly
+        from zero to the maximum value.
+
+        Args:
+            matrix: The matrix of values
+            colors: The colors, as returned by get_colors
+            max_value: The value mapped to the last color
+        Returns:
+            The height X width X 3 array of the pixels' RGB colors
+    '''
+    scaled = np.asarray(matrix, dtype=np.float64) * ((len(colors) - 1) / max(max_value, 1))
+    return colors[np.clip(scaled, 0, len(colors) - 1).astype(np.int64)]
+
+
+def get_png_chunk(kind, data):
+    '''
+        Builds a chunk of a PNG file.
+
+        Args:
+            kind: The four bytes naming the chunk's type
+            data: The chunk's content
+        Returns:
+            The bytes of the chunk, with its length and checksum
+    '''
+    checksum = zlib.crc32(kind + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', checksum)
+
+
+def encode_png(pixels):
+    '''
+        Encodes the pixels as a PNG image.
+
+        Args:
+            pixels: The height X width X 3 array of RGB colors
+        Returns:
+            The bytes of the PNG image
+    '''
+    height, width, _ = pixels.shape
+    # Every row starts with the 'None' filter type
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8),
+                           pixels.reshape(height, width * 3).astype(np.uint8)], axis=1)
+
+    # 8 bits per channel, RGB colors, no interlacing
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n'
+            + get_png_chunk(b'IHDR', header)
+            + get_png_chunk(b'IDAT', zlib.compress(rows.tobytes()))
+            + get_png_chunk(b'IEND', b''))
+
+
+def to_data_uri(png):
+    '''
+        Embeds the PNG image in a data URI, usable
+        as the source of an image.
+
+        Args:
+            png: The bytes of the PNG image
+        Returns:
+            The data URI
+    '''
+    return 'data:image/png;base64,' + base64.b64encode(png).decode('ascii')
@@ -1,11 +1,17 @@
 '''
     Contains some functions related to the creation of the line chart.
 '''
+import pandas as pd
+import plotly.colors
 import plotly.graph_objects as go
 import hover_template
 
+from resolutions import RESOLUTIONS
 from template import THEME
 
+# The year over which series of different years are overlaid
+REFERENCE_YEAR = 2000
+
 
 def get_empty_figure():
     '''
@@ -72,7 +78,28 @@ def add_rectangle_shape(fig):
     return fig
 
 
-def get_figure(line_data, arrond, year):
+def get_tick_format(resolution, all_years=False):
+    '''
+        Gets the format of the x-axis ticks for the
+        given resolution.
+
+        Within a year, the ticks show the zero-padded day and
+        abbreviated month, or only the month if the resolution
+        is 'Month'. Over several years, they show the abbreviated
+        month and the year.
+
+        Args:
+            resolution: The resolution, one of RESOLUTIONS
+            all_years: Whether the line chart covers several years
+        Returns:
+            The format of the ticks
+    '''
+    if all_years:
+        return '%b %Y'
+    return '%b' if resolution == RESOLUTIONS['month'] else '%d %b'
+
+
+def get_figure(line_data, arrond, year, tickformat='%d %b'):
     '''
         Generates the line chart using the given data.
 
@@ -89,10 +116,13 @@ def get_figure(line_data, arrond, year):
             line_data: The data to display in the
             line chart
             arrond: The selected neighborhood
-            year: The selected year
+            year: The selected year, or a text describing
+                the selected years
+            tickformat: The format of the x-axis ticks
         Returns:
             The figure to be displayed
     '''
+    period = year if isinstance(year, str) else f'in {year}'
     scatter_mode = 'markers' if len(line_data) == 1 else 'lines'
     scatter_trace = go.Scatter(
         x=line_data['Date_Plantation'],
@@ -101,10 +131,54 @@ def get_figure(line_data, arrond, year):
     )
     fig = go.Figure(
         data=[scatter_trace],
-        layout_title_text=f'Trees planted in {arrond} in {year}',
+        layout_title_text=f'Trees planted in {arrond} {period}',
     )
     fig.update_yaxes(title_text='Trees')
-    fig.update_xaxes(tickformat='%d %b', tickangle=-45)
+    fig.update_xaxes(tickformat=tickformat, tickangle=-45)
     fig.update_traces(hovertemplate=hover_template.get_linechart_hover_template())
     
     return fig
+
+
+def get_comparison_figure(series, tickformat='%d %b'):
+    '''
+        Generates the line chart overlaying several series.
+
+        Series of different years are drawn over the same
+        reference year, so their days line up, while their
+        hover tooltips show their actual dates.
+
+        Args:
+            series: The (neighborhood, year, series) tuples
+                returned by preprocess.get_series_batch
+            tickformat: The format of the x-axis ticks
+        Returns:
+            The figure to be displayed
+    '''
+    years = {year for _, year, _ in series}
+    overlay = len(years) > 1
+
+    fig = go.Figure()
+    for arrond, year, line_data in series:
+        dates = line_data['Date_Plantation']
+        if overlay:
+            # The reference year is a leap year, so every day has a place
+            dates = dates + pd.DateOffset(years=REFERENCE_YEAR - year)
+        fig.add_trace(go.Scatter(
+            x=dates,
+            y=line_data['Counts'],
+            customdata=line_data['Date_Plantation'].dt.strftime('%d %b %Y'),
+            mode='markers' if len(line_data) == 1 else 'lines',
+            name=arrond if year is None else f'{arrond} ({year})',
+        ))
+
+    fig.update_layout(
+        title_text=f'Trees planted in {len(series)} selected cells',
+        colorway=getattr(plotly.colors.qualitative, THEME['comparison_colorway']),
+        showlegend=True
+    )
+    fig.update_yaxes(title_text='Trees')
+    fig.update_xaxes(tickformat=tickformat, tickangle=-45)
+    fig.update_traces(hovertemplate=hover_template.get_comparison_hover_template())
+
+    return fig
@@ -3,101 +3,566 @@
 '''
 
 import datetime as dt
+
+import numpy as np
 import pandas as pd
 
+from resolutions import RESOLUTIONS
+
+
+# The column containing the trees' species
+SPECIES_COLUMN = 'Essence_fr'
+# The species of the trees whose species is missing
+UNKNOWN_SPECIES = 'Unknown'
+
+# The only columns of the inventory used by the app
+TREE_COLUMNS = ['Arrond_Nom', 'Date_Plantation', SPECIES_COLUMN]
+
+# The format of the inventory's planting dates
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+NB_OF_MONTHS = 12
+
+# The filters counting every species and month, as a (species, months) pair
+NO_FILTERS = (None, None)
+
+
+def read_trees(path, chunksize=None, names=None):
+    '''
+        Reads the tree inventory, keeping only the columns
+        used by the app.
+
+        The neighborhoods and species are read as categories
+        and the dates are converted to datetime objects.
+
+        When a chunk size is given, the file is read lazily
+        and the chunks are processed one at a time.
+
+        Args:
+            path: The path to the .csv file, or an open file
+            chunksize: The number of rows per chunk, if any
+            names: The names of the columns, if the file
+                has no header
+        Returns:
+            A pandas dataframe with columns 'Arrond_Nom',
+            'Date_Plantation' and SPECIES_COLUMN, or an
+            iterator over such dataframes if a chunk size
+            is given.
+    '''
+    reader = pd.read_csv(path, usecols=TREE_COLUMNS,
+                         dtype={'Arrond_Nom': 'category'},
+                         chunksize=chunksize,
+                         names=names,
+                         header='infer' if names is None else None)
+    if chunksize is None:
+        return prepare_trees(reader)
+    return (prepare_trees(chunk) for chunk in reader)
+
+
+def prepare_trees(dataframe):
+    '''
+        Fills the missing species, as UNKNOWN_SPECIES, and
+        converts the dates of the read inventory.
+
+        Args:
+            dataframe: The dataframe to process
+        Returns:
+            The processed dataframe, with its columns
+            in the order of TREE_COLUMNS.
+    '''
+    dataframe[SPECIES_COLUMN] = dataframe[SPECIES_COLUMN] \
+        .fillna(UNKNOWN_SPECIES).astype('category')
+    return convert_dates(dataframe[TREE_COLUMNS])
+
+
 def convert_dates(dataframe):
     '''
         Converts the dates in the dataframe to datetime objects.
 
+        The dates are parsed with the inventory's format, rather
+        than having it guessed for each of them.
+
         Args:
             dataframe: The dataframe to process
         Returns:
             The processed dataframe with datetime-formatted dates.
     '''
     # TODO : Convert dates
-    dataframe["Date_Plantation"] = pd.to_datetime(dataframe["Date_Plantation"])
+    dataframe["Date_Plantation"] = pd.to_datetime(dataframe["Date_Plantation"],
+                                                 format=DATE_FORMAT)
     return dataframe
 
 
-def filter_years(dataframe, start, end):
+def select_years(yearly_counts, start, end):
     '''
-        Filters the elements of the dataframe by date, making sure
-        they fall in the desired range.
+        Selects the years of the yearly counts which fall
+        in the desired range.
+
+        The counts are summarized once over every year,
+        so a range is a slice of their columns rather
+        than a new pass over the data.
 
         Args:
-            dataframe: The dataframe to process
+            yearly_counts: The dataframe returned by filter_counts
             start: The starting year (inclusive)
             end: The ending year (inclusive)
         Returns:
-            The dataframe filtered by date.
+            The yearly counts of the years in the range
     '''
-    # TODO : Filter by dates
-    start_datetime = dt.datetime(start, 1, 1)
-    end_datetime = dt.datetime(end, 12, 31)
-    return dataframe[(dataframe["Date_Plantation"] >= start_datetime) & (dataframe["Date_Plantation"] <= end_datetime)]
+    return yearly_counts.loc[:, start:end]
+
 
-def summarize_yearly_counts(dataframe):
+def count_daily_trees(dataframe):
     '''
-        Groups the data by neighborhood and year,
-        summing the number of trees planted in each neighborhood
-        each year.
+        Counts the trees of each species planted in each
+        neighborhood each day.
+
+        Trees without a planting date are not counted.
+
+        The trees can be given as chunks, in which case each
+        chunk is counted on its own and added to the counts
+        of the previous ones, so only the counts and a single
+        chunk are kept in memory.
 
         Args:
-            dataframe: The dataframe to process
+            dataframe: The dataframe to process, or an iterable
+                of chunks of that dataframe
+        Returns:
+            A pandas dataframe with columns 'Arrond_Nom',
+            'Date_Plantation', SPECIES_COLUMN and 'Counts'.
+    '''
+    chunks = [dataframe] if isinstance(dataframe, pd.DataFrame) else dataframe
+
+    counts = pd.Series(dtype=np.int64)
+    for chunk in chunks:
+        chunk = chunk.dropna(subset=['Date_Plantation'])
+        chunk_counts = chunk.groupby(TREE_COLUMNS, observed=True).size()
+        # Chunks have different categories, so the counts use plain names
+        index = chunk_counts.index
+        chunk_counts.index = index.set_levels([level.astype(str) if level.dtype == 'category'
+                                               else level for level in index.levels])
+        counts = chunk_counts if counts.empty else counts.add(chunk_counts, fill_value=0)
+
+    daily_trees = counts.astype(np.int64).rename_axis(TREE_COLUMNS) \
+        .reset_index(name='Counts')
+    return daily_trees.astype({'Arrond_Nom': 'category', SPECIES_COLUMN: 'category'})
+
+
+def add_daily_trees(daily_trees, new_trees):
+    '''
+        Adds the counts of new trees to the counts of the
+        trees of each species planted in each neighborhood
+        each day.
+
+        Args:
+            daily_trees: The counts returned by count_daily_trees
+            new_trees: The counts of the new trees, also returned
+                by count_daily_trees
+        Returns:
+            The sum of the counts, in the same format.
+    '''
+    counts = pd.concat([daily_trees, new_trees], ignore_index=True) \
+        .astype({'Arrond_Nom': str, SPECIES_COLUMN: str})
+    counts = counts.groupby(TREE_COLUMNS)['Counts'].sum().reset_index()
+    return counts.astype({'Arrond_Nom': 'category', SPECIES_COLUMN: 'category'})
+
+
+def build_count_cube(daily_trees):
+    '''
+        Counts the trees planted in each neighborhood, each
+        year and each month, for each species.
+
+        The counts are binned in a single pass over the codes
+        of the neighborhoods and species, so any combination of
+        filters on the species and months is a sum over the cube.
+
+        Args:
+            daily_trees: The counts returned by count_daily_trees
+        Returns:
+            A dictionary containing the neighborhoods under
+            'neighborhoods', the years under 'years', the species
+            under 'species' and the neighborhood X year X month X
+            species array of counts under 'counts'.
+    '''
+    neighborhoods = pd.Categorical(daily_trees['Arrond_Nom'])
+    species = pd.Categorical(daily_trees[SPECIES_COLUMN])
+    dates = daily_trees['Date_Plantation']
+
+    years = np.arange(dates.dt.year.min(), dates.dt.year.max() + 1)
+    shape = (len(neighborhoods.categories), len(years), NB_OF_MONTHS, len(species.categories))
+    cells = neighborhoods.codes.astype(np.int64)
+    cells = cells * shape[1] + (dates.dt.year.to_numpy() - years[0])
+    cells = cells * shape[2] + (dates.dt.month.to_numpy() - 1)
+    cells = cells * shape[3] + species.codes
+    counts = np.bincount(cells, weights=daily_trees['Counts'], minlength=np.prod(shape))
+
+    return dict(neighborhoods=neighborhoods.categories,
+                years=years,
+                species=species.categories,
+                counts=counts.astype(np.int32).reshape(shape))
+
+
+def filter_counts(count_cube, filters=NO_FILTERS):
+    '''
+        Sums the counts of the trees of the given species
+        planted during the given months, per neighborhood
+        and year.
+
+        Args:
+            count_cube: The counts returned by build_count_cube
+            filters: The species and the months, from 1 to 12, to
+                count, as a (species, months) pair where None
+                counts every species or month
         Returns:
-            The processed dataframe with column 'Counts'
-            containing the counts of planted
-            trees for each neighborhood each year.
+            A pandas dataframe with the neighborhoods as index and
+            the years as columns, with the empty cells and the
+            years without planted trees filled with zeros.
     '''
-    # TODO : Summarize df
-    return dataframe.groupby(["Arrond_Nom", dataframe["Date_Plantation"].dt.year]).size().reset_index(name="Counts")
+    species, months = filters
+    counts = count_cube['counts']
+    if months:
+        counts = counts[:, :, np.asarray(months) - 1]
+    if species:
+        codes = count_cube['species'].get_indexer(species)
+        counts = counts[..., codes[codes >= 0]]
+
+    return pd.DataFrame(counts.sum(axis=(2, 3)),
+                        index=count_cube['neighborhoods'].rename('Arrond_Nom'),
+                        columns=pd.Index(count_cube['years'], name='Date_Plantation'))
 
 
-def restructure_df(yearly_df):
+def summarize_daily_counts(daily_trees):
     '''
-        Restructures the dataframe into a format easier
-        to be displayed as a heatmap.
+        Counts the trees planted in each neighborhood each day,
+        from the first day of the first year to the last day
+        of the last year of the data.
 
-        The resulting dataframe should have as index
-        the names of the neighborhoods, while the columns
-        should be each considered year. The values
-        in each cell represent the number of trees
-        planted by the given neighborhood the given year.
+        The counts are computed in a single pass and stored as a
+        matrix, so the daily series of any neighborhood and year
+        is a slice of a row.
 
-        Any empty cells are filled with zeros.
+        The counts per species are also kept, sorted by neighborhood,
+        day and species, so the daily series of some species is read
+        from a slice of them. The cumulative sums of each row are kept
+        too, so the sum over any range of days is the difference of
+        two of them.
 
         Args:
-            yearly_df: The dataframe to process
+            daily_trees: The counts returned by count_daily_trees
         Returns:
-            The restructured dataframe
+            A dictionary containing the neighborhoods under
+            'neighborhoods', the species under 'species', the days
+            under 'days', the neighborhood X day matrix of counts
+            under 'counts', its cumulative sums over the days, starting
+            with a column of zeros, under 'cumulative' and the counts
+            per neighborhood, day and species under 'species_counts',
+            with their sorted cells under 'species_cells'.
     '''
-    # TODO : Restructure df and fill empty cells with 0
+    neighborhoods = pd.Categorical(daily_trees['Arrond_Nom'])
+    species = pd.Categorical(daily_trees[SPECIES_COLUMN])
+    dates = daily_trees['Date_Plantation']
 
-    dataframe = yearly_df.pivot(index="Arrond_Nom", columns="Date_Plantation", values="Counts") 
-    return dataframe.fillna(0)
+    days = pd.date_range(dt.datetime(dates.min().year, 1, 1),
+                         dt.datetime(dates.max().year, 12, 31))
+    columns = (dates - days[0]).dt.days.to_numpy()
+    cells = neighborhoods.codes.astype(np.int64) * len(days) + columns
+    counts = np.bincount(cells, weights=daily_trees['Counts'],
+                         minlength=len(neighborhoods.categories) * len(days))
 
+    species_cells = cells * len(species.categories) + species.codes
+    order = np.argsort(species_cells, kind='mergesort')
 
-def get_daily_info(dataframe, arrond, year):
+    counts = counts.astype(np.int64).reshape(len(neighborhoods.categories), len(days))
+    cumulative = np.zeros((len(neighborhoods.categories), len(days) + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+
+    return dict(neighborhoods=neighborhoods.categories,
+                species=species.categories,
+                days=days,
+                counts=counts,
+                cumulative=cumulative,
+                species_cells=species_cells[order],
+                species_counts=daily_trees['Counts'].to_numpy()[order])
+
+
+def get_day_range(daily_counts, first_year, last_year):
     '''
-        From the given dataframe, gets
-        the daily amount of planted trees
-        in the given neighborhood and year.
+        Gets the columns of the daily counts covering the
+        given years.
 
         Args:
-            dataframe: The dataframe to process
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
+            first_year: The first year (inclusive)
+            last_year: The last year (inclusive)
+        Returns:
+            The first column (inclusive) and last column
+            (exclusive) of the years
+    '''
+    first_day = daily_counts['days'][0]
+    start = (dt.datetime(first_year, 1, 1) - first_day).days
+    end = (dt.datetime(last_year + 1, 1, 1) - first_day).days
+    return (min(max(start, 0), len(daily_counts['days'])),
+            min(max(end, 0), len(daily_counts['days'])))
+
+
+def get_range_positions(values, lower_values, upper_values):
+    '''
+        Gets the positions of the sorted values falling in each
+        of the given ranges.
+
+        Args:
+            values: The sorted values
+            lower_values: The lower bound of each range (inclusive)
+            upper_values: The upper bound of each range (exclusive)
+        Returns:
+            positions: The positions of the values in the ranges,
+                range after range
+            groups: The range of each position
+    '''
+    lower = np.searchsorted(values, lower_values)
+    lengths = np.searchsorted(values, upper_values) - lower
+    groups = np.repeat(np.arange(len(lengths)), lengths)
+    positions = np.arange(lengths.sum()) + np.repeat(lower - np.cumsum(lengths) + lengths, lengths)
+    return positions, groups
+
+
+def get_species_counts(daily_counts, rows, start, end, species):
+    '''
+        Gets the trees of the given species planted in some
+        neighborhoods each day, summed from the slices of the
+        counts per species of those neighborhoods and days.
+
+        The slices of every row are gathered and binned at once.
+
+        Args:
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
+            rows: The rows of the neighborhoods
+            start: The first column of the days (inclusive)
+            end: The last column of the days (exclusive)
+            species: The species to count
+        Returns:
+            The row X day matrix of counts
+    '''
+    nb_of_species = len(daily_counts['species'])
+    first_cells = np.asarray(rows, dtype=np.int64) * len(daily_counts['days']) + start
+    positions, groups = get_range_positions(daily_counts['species_cells'],
+                                            first_cells * nb_of_species,
+                                            (first_cells + end - start) * nb_of_species)
+
+    cells = daily_counts['species_cells'][positions]
+    codes = daily_counts['species'].get_indexer(species)
+    selected = np.isin(cells % nb_of_species, codes[codes >= 0])
+    columns = cells[selected] // nb_of_species - first_cells[groups[selected]] \
+        + groups[selected] * (end - start)
+    counts = np.bincount(columns, weights=daily_counts['species_counts'][positions[selected]],
+                         minlength=len(first_cells) * (end - start))
+    return counts.astype(np.int64).reshape(len(first_cells), end - start)
+
+
+def get_cumulative_counts(daily_counts, rows, start, end, filters=NO_FILTERS):
+    '''
+        Gets the cumulative sums of the trees planted in some
+        neighborhoods each day, from the given first day.
+
+        Without filters, they are a slice of the neighborhoods'
+        cumulative sums. When species are given, the daily counts
+        are instead found by get_species_counts.
+
+        Args:
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
+            rows: The rows of the neighborhoods
+            start: The first column of the days (inclusive)
+            end: The last column of the days (exclusive)
+            filters: The species and the months, from 1 to 12, to
+                count, as a (species, months) pair where None
+                counts every species or month
+        Returns:
+            A matrix whose element (i, j) is the number of trees
+            planted in the i-th neighborhood in the first j days
+    '''
+    species, months = filters
+    if not species and not months:
+        cumulative = daily_counts['cumulative'][rows, start:end + 1]
+        return cumulative - cumulative[:, :1]
+
+    if species:
+        counts = get_species_counts(daily_counts, rows, start, end, species)
+    else:
+        counts = daily_counts['counts'][rows, start:end]
+
+    if months:
+        counts = np.where(np.isin(daily_counts['days'][start:end].month, months), counts, 0)
+
+    cumulative = np.zeros((len(counts), end - start + 1), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=cumulative[:, 1:])
+    return cumulative
+
+
+def get_bucket_edges(days, resolution):
+    '''
+        Splits the days in days, weeks or months.
+
+        The first bucket starts on the first day, even if
+        it is not the first day of a week or month.
+
+        Args:
+            days: The consecutive days to split
+            resolution: The resolution, one of RESOLUTIONS
+        Returns:
+            The positions in the days where each bucket starts,
+            followed by the number of days
+    '''
+    if resolution == RESOLUTIONS['week']:
+        is_first_day = days.dayofweek == 0
+    elif resolution == RESOLUTIONS['month']:
+        is_first_day = days.day == 1
+    else:
+        is_first_day = np.ones(len(days), dtype=bool)
+
+    return np.append(np.flatnonzero(is_first_day | (np.arange(len(days)) == 0)), len(days))
+
+
+def get_bucket_counts(daily_counts, years, resolution=RESOLUTIONS['day'],
+                      filters=NO_FILTERS, rows=None):
+    '''
+        From the daily counts, gets the amount of planted trees
+        in the given neighborhoods during the given years, per
+        day, week or month.
+
+        The counts are the differences of the cumulative sums at
+        the start of each bucket, computed for all the rows at
+        once, with or without filters.
+
+        Args:
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
+            years: The first and last years (inclusive)
+            resolution: The resolution, one of RESOLUTIONS
+            filters: The species and the months, from 1 to 12, to
+                count, as a (species, months) pair where None
+                counts every species or month
+            rows: The rows of the neighborhoods, or None for
+                every neighborhood
+        Returns:
+            counts: The neighborhood X bucket matrix of counts
+            dates: The first day of each bucket
+    '''
+    if rows is None:
+        rows = np.arange(len(daily_counts['neighborhoods']))
+
+    start, end = get_day_range(daily_counts, *years)
+    days = daily_counts['days'][start:end]
+    edges = get_bucket_edges(days, resolution)
+
+    cumulative = get_cumulative_counts(daily_counts, rows, start, end, filters)
+    return cumulative[:, edges[1:]] - cumulative[:, edges[:-1]], days[edges[:-1]]
+
+
+def get_series(daily_counts, arrond, years, resolution=RESOLUTIONS['day'], filters=NO_FILTERS):
+    '''
+        From the daily counts, gets the amount of planted
+        trees in the given neighborhood and years, per day,
+        week or month.
+
+        Each week or month is the difference between the
+        cumulative sums of the trees planted before and after
+        it, so a series costs as much at any resolution. The
+        series goes from the first to the last day, week or
+        month with planted trees.
+
+        Args:
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
             arrond: The desired neighborhood
-            year: The desired year
+            years: The first and last years (inclusive)
+            resolution: The resolution, one of RESOLUTIONS
+            filters: The species and the months, from 1 to 12, to
+                count, as a (species, months) pair where None
+                counts every species or month
         Returns:
-            The daily tree count data for that
-            neighborhood and year.
+            The tree count data for that neighborhood and years,
+            where each date is the first day of its week or month.
     '''
-    # TODO : Get daily tree count data and return
+    row = daily_counts['neighborhoods'].get_loc(arrond)
+    start, end = get_day_range(daily_counts, *years)
+    days = daily_counts['days'][start:end]
+    cumulative = get_cumulative_counts(daily_counts, [row], start, end, filters)[0]
 
-    dataframe = dataframe[(dataframe["Date_Plantation"].dt.year == year) & (dataframe["Arrond_Nom"] == arrond)]
-    dataframe = dataframe.groupby(["Date_Plantation"]).size().reset_index(name="Counts")
+    edges = get_bucket_edges(days, resolution)
+    counts = cumulative[edges[1:]] - cumulative[edges[:-1]]
 
-    # fill the missing dates with 0
-    dataframe = dataframe.set_index("Date_Plantation").asfreq("d", fill_value=0).reset_index()
+    return trim_series(days[edges[:-1]], counts)
 
-    return dataframe
 
+def trim_series(dates, counts):
+    '''
+        Builds a series from its dates and counts, keeping
+        only the dates from the first to the last one with
+        planted trees.
+
+        Args:
+            dates: The dates of the series
+            counts: The counts of each date
+        Returns:
+            A pandas dataframe with columns 'Date_Plantation'
+            and 'Counts'.
+    '''
+    planted = np.flatnonzero(counts)
+    if len(planted) == 0:
+        return pd.DataFrame({'Date_Plantation': dates[:0], 'Counts': counts[:0]})
+
+    first, last = planted[0], planted[-1] + 1
+    return pd.DataFrame({
+        'Date_Plantation': dates[first:last],
+        'Counts': counts[first:last]
+    })
+
+
+def get_series_batch(daily_counts, cells, resolution=RESOLUTIONS['day'],
+                     filters=NO_FILTERS, all_years=False):
+    '''
+        From the daily counts, gets the series of several
+        neighborhoods and years at once.
+
+        The counts of the selected neighborhoods are computed
+        together, by get_bucket_counts, in a single slice per
+        selected year, so comparing several neighborhoods costs
+        about as much as a single one. With all_years, every
+        year of each selected neighborhood is taken from a
+        single slice.
+
+        Args:
+            daily_counts: The daily counts, as returned by
+                summarize_daily_counts
+            cells: The selected (neighborhood, year) pairs
+            resolution: The resolution, one of RESOLUTIONS
+            filters: The species and the months, from 1 to 12, to
+                count, as a (species, months) pair where None
+                counts every species or month
+            all_years: Whether to get every year of the selected
+                neighborhoods rather than only the selected years
+        Returns:
+            A list of (neighborhood, year, series) tuples, where each
+            series is as returned by get_series and the year is None
+            with all_years
+    '''
+    if all_years:
+        years = daily_counts['days'][[0, -1]].year
+        # Each neighborhood is only drawn once, in the order of selection
+        cells = [(arrond, None) for arrond in dict.fromkeys(arrond for arrond, _ in cells)]
+        ranges = {None: (years[0], years[1])}
+    else:
+        ranges = {year: (year, year) for _, year in cells}
+
+    series = {}
+    for year, year_range in ranges.items():
+        arronds = [arrond for arrond, cell_year in cells if cell_year == year]
+        rows = daily_counts['neighborhoods'].get_indexer(arronds)
+        counts, dates = get_bucket_counts(daily_counts, year_range, resolution, filters, rows)
+        series.update(((arrond, year), trim_series(dates, row_counts))
+                      for arrond, row_counts in zip(arronds, counts))
+
+    return [(arrond, year, series[arrond, year]) for arrond, year in cells]
@@ -0,0 +1,13 @@
+'''
+    This file contains some constants to help manage the
+    resolutions of the line chart, Day, Week and Month.
+'''
+
+RESOLUTIONS = dict(day='Day', week='Week', month='Month')
+
+# The heatmap shows years as cells, or days and weeks as an image
+HEATMAP_RESOLUTIONS = dict(
+    year='Year',
+    week=RESOLUTIONS['week'],
+    day=RESOLUTIONS['day']
+)
@@ -4,6 +4,8 @@
 import plotly.graph_objects as go
 import plotly.io as pio
 
+# The name under which 'plotly_white' merged with the custom theme is registered
+DEFAULT_TEMPLATE = 'plotly_white_custom_theme'
 
 THEME = {
     'background_color': '#ffffff',
@@ -14,7 +16,8 @@ THEME = {
     'line_chart_color': '#97939A',
     'label_font_size': 14,
     'label_background_color': '#ffffff',
-    'colorscale': 'Bluyl'
+    'colorscale': 'Bluyl',
+    'comparison_colorway': 'Safe'
 }
 
 
@@ -80,6 +83,12 @@ def set_default_theme():
     '''
         Sets the default theme to be a combination of the
         'plotly_white' theme and our custom theme.
+
+        Plotly merges the templates of a name joined with '+'
+        each time a figure is built, so they are merged once
+        and the result is registered as DEFAULT_TEMPLATE.
     '''
     # TODO : Set default theme DONE
-    pio.templates.default = 'plotly_white+custom_theme'
+    pio.templates[DEFAULT_TEMPLATE] = pio.templates.merge_templates(
+        pio.templates['plotly_white'], pio.templates['custom_theme'])
+    pio.templates.default = DEFAULT_TEMPLATE
@@ -9,40 +9,57 @@
 
     This file contains the source code for TP4.
 '''
-import json
-
 import dash
 import dash_html_components as html
 import dash_core_components as dcc
-
-import pandas as pd
+from dash.dependencies import Input, Output, State, ClientsideFunction
 
 import preprocess
 import bubble
 
+DATA_PATH = '../src/assets/data/countriesData.json'
+# The number of years after the displayed one whose frames are fetched in advance
+PREFETCH_FRAMES = 5
+# The time each year is displayed while animating, in milliseconds
+FRAME_DURATION = 750
+
 app = dash.Dash(__name__)
 app.title = 'TP4 | INF8808'
 
-with open('../src/assets/data/countriesData.json') as data_file:
-    data = json.load(data_file)
+df = preprocess.load_countries(DATA_PATH)
+
+years = df['Year'].cat.categories.tolist()
+ranges = preprocess.get_ranges(df, ['GDP', 'CO2'])
+continents = sorted(df['Continent'].unique())
+max_population = df['Population'].max()
+
+# Every frame is built at once, then sent when the client needs it
+frames = bubble.get_frames(df, continents)
 
-df_2000 = pd.json_normalize(data, '2000')
-df_2015 = pd.json_normalize(data, '2015')
 
-df_2000 = preprocess.round_decimals(df_2000)
-df_2015 = preprocess.round_decimals(df_2015)
+def get_frame_window(year, fetched_years):
+    '''
+        Gets the frames of the given year and of the next
+        PREFETCH_FRAMES years which were not fetched yet.
 
-gdp_range = preprocess.get_range('GDP', df_2000, df_2015)
-co2_range = preprocess.get_range('CO2', df_2000, df_2015)
+        Args:
+            year: The displayed year
+            fetched_years: The years whose frames were fetched
+        Returns:
+            A dictionary mapping each year to its frame
+    '''
+    start = years.index(year)
+    return {
+        str(next_year): frames[next_year]
+        for next_year in years[start:start + PREFETCH_FRAMES + 1]
+        if str(next_year) not in fetched_years
+    }
 
-df = preprocess.combine_dfs(df_2000, df_2015)
-df = preprocess.sort_dy_by_yr_continent(df)
 
-fig = bubble.get_plot(df, gdp_range, co2_range)
-fig = bubble.update_animation_hover_template(fig)
-fig = bubble.update_animation_menu(fig)
+fig = bubble.get_plot(frames[years[0]], ranges['GDP'], ranges['CO2'])
 fig = bubble.update_axes_labels(fig)
 fig = bubble.update_template(fig)
+fig = bubble.update_trace_defaults(fig, max_population)
 fig = bubble.update_legend(fig)
 
 fig.update_layout(height=600, width=1000)
@@ -54,12 +71,112 @@ app.layout = html.Div(className='content', children=[
         html.H2('In countries around the world')
     ]),
     html.Main(className='viz-container', children=[
-        dcc.Graph(className='graph', figure=fig, config=dict(
+        dcc.Graph(id='bubble-chart', className='graph', figure=fig, config=dict(
             scrollZoom=False,
             showTips=False,
             showAxisDragHandles=False,
             doubleClick=False,
             displayModeBar=False
+            ),
+            animate=True,
+            animation_options=dict(
+                frame=dict(redraw=False),
+                transition=dict(duration=FRAME_DURATION, easing='cubic-in-out')
             ))
-    ])
+    ]),
+    html.Footer(className='animation-menu', children=[
+        html.Button('Animate', id='animate-button'),
+        html.Div(className='year-slider', children=[
+            html.P(id='year-caption', children='Data for year: {}'.format(years[0])),
+            dcc.Slider(
+                id='year-slider',
+                min=years[0],
+                max=years[-1],
+                step=None,
+                value=years[0],
+                marks={year: str(year) if year % 5 == 0 else '' for year in years}
+            )
+        ])
+    ]),
+    dcc.Interval(id='animation-interval', interval=FRAME_DURATION, disabled=True),
+    dcc.Store(id='fetched-frames'),
+    dcc.Store(id='frames', data={}),
+    dcc.Store(id='frame-years', data=[])
 ])
+
+
+@app.callback(
+    Output('fetched-frames', 'data'),
+    [Input('year-slider', 'value')],
+    [State('frame-years', 'data')]
+)
+def year_changed(year, fetched_years):
+    '''
+        When the displayed year changes, sends the frames of
+        the year and of the next few years which the client
+        does not have yet, so the animation does not wait
+        for them.
+
+        Args:
+            year: The displayed year
+            fetched_years: The years whose frames the client has
+        Returns:
+            The frames to add to the client's frames
+    '''
+    window = get_frame_window(year, fetched_years)
+    return window if window else dash.no_update
+
+
+@app.callback(
+    [Output('animation-interval', 'disabled'),
+     Output('year-slider', 'value')],
+    [Input('animate-button', 'n_clicks'),
+     Input('animation-interval', 'n_intervals')],
+    [State('animation-interval', 'disabled'),
+     State('year-slider', 'value')],
+    prevent_initial_call=True
+)
+def animation_updated(n_clicks, n_intervals, disabled, year):  # pylint: disable=unused-argument
+    '''
+        When the animate button is clicked, starts or stops
+        the animation. The animation starts over from the
+        first year if the last one is displayed.
+
+        On each tick of the animation, displays the next
+        year, and stops once the last year is displayed.
+
+        Args:
+            n_clicks: The number of clicks on the button
+            n_intervals: The number of ticks of the animation
+            disabled: Whether the animation is stopped
+            year: The displayed year
+        Returns:
+            Whether the animation is stopped and the year to display
+    '''
+    if dash.callback_context.triggered[0]['prop_id'].split('.')[0] == 'animate-button':
+        if not disabled:
+            return True, dash.no_update
+        return False, years[0] if year == years[-1] else dash.no_update
+
+    if year == years[-1]:
+        return True, dash.no_update
+    next_year = years[years.index(year) + 1]
+    return next_year == years[-1], next_year
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='frames', function_name='add_frames'),
+    [Output('frames', 'data'), Output('frame-years', 'data')],
+    [Input('fetched-frames', 'data')],
+    [State('frames', 'data')],
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='frames', function_name='show_frame'),
+    [Output('bubble-chart', 'figure'), Output('year-caption', 'children')],
+    [Input('year-slider', 'value'),
+     Input('frames', 'data')],
+    [State('bubble-chart', 'figure')],
+    prevent_initial_call=True
+)
@@ -0,0 +1,35 @@
+/*
+    Contains the clientside callbacks of the app.
+
+    Dash loads every .js file in the assets folder, so the functions
+    defined here can be referenced with a ClientsideFunction.
+*/
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    frames: {
+        /*
+            Adds the frames sent by the server to the ones already
+            fetched, and lists the years of the fetched frames so the
+            server only sends the missing ones.
+        */
+        add_frames: function (fetchedFrames, frames) {
+            const allFrames = Object.assign({}, frames, fetchedFrames);
+            return [allFrames, Object.keys(allFrames)];
+        },
+
+        /*
+            Displays the frame of the given year, animating the
+            transition from the displayed one. Nothing is displayed
+            until the frame is fetched.
+        */
+        show_frame: function (year, frames, figure) {
+            const frame = frames[year];
+
+            if (!frame) {
+                return [window.dash_clientside.no_update, window.dash_clientside.no_update];
+            }
+
+            return [Object.assign({}, figure, {data: frame}), 'Data for year: ' + year];
+        }
+    }
+});
@@ -2,104 +2,125 @@
     This file contains the code for the bubble plot.
 '''
 
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 
 import hover_template
 
+# The minimum and maximum sizes of the markers, in pixels
+MIN_SIZE = 5
+MAX_SIZE = 30
 
-def get_plot(my_df, gdp_range, co2_range):
+
+def get_frames(my_df, continents):
     '''
-        Generates the bubble plot.
+        Generates the frames of the animation, with a trace
+        per continent in every year.
+
+        The rows are grouped by year and continent once, by
+        sorting their codes, and each trace is a slice of the
+        sorted columns. Every frame has a trace for each
+        continent, even if it is empty, so the traces keep
+        their order and color from one frame to the next.
+
+        The settings shared by every trace are not part of
+        the frames, they are set by update_trace_defaults.
 
-        The x and y axes are log scaled, and there is
-        an animation between the data for years 2000 and 2015.
+        Args:
+            my_df: The dataframe of every year, with a
+                categorical 'Year' column
+            continents: The sorted continents of every year
+        Returns:
+            A dictionary mapping each year to the list of
+            its traces, as dictionaries
+    '''
+    years = my_df['Year'].cat.categories
+    year_codes = my_df['Year'].cat.codes.to_numpy(np.int64)
+    continent_codes = np.searchsorted(continents, my_df['Continent'].to_numpy())
+
+    groups = year_codes * len(continents) + continent_codes
+    order = np.argsort(groups, kind='stable')
+    bounds = np.r_[0, np.cumsum(np.bincount(groups, minlength=len(years) * len(continents)))]
+
+    # The numbers are rounded to two decimal points
+    gdp = np.round(my_df['GDP'].to_numpy()[order], 2)
+    co2 = np.round(my_df['CO2'].to_numpy()[order], 2)
+    population = my_df['Population'].to_numpy()[order]
+    names = my_df['Country Name'].to_numpy(object)[order]
+    custom_data = np.column_stack([names, population.astype(object)])
+    colors = dict(zip(continents, px.colors.qualitative.Plotly))
+
+    return {
+        year: [
+            dict(
+                name=continent,
+                legendgroup=continent,
+                ids=names[bounds[group]:bounds[group + 1]],
+                x=gdp[bounds[group]:bounds[group + 1]],
+                y=co2[bounds[group]:bounds[group + 1]],
+                customdata=custom_data[bounds[group]:bounds[group + 1]],
+                marker=dict(color=colors[continent],
+                            size=population[bounds[group]:bounds[group + 1]])
+            )
+            for group, continent in enumerate(continents, start=year_code * len(continents))
+        ]
+        for year_code, year in enumerate(years)
+    }
+
+
+def get_plot(frame, gdp_range, co2_range):
+    '''
+        Generates the bubble plot, displaying the given frame.
 
-        The markers' maximum size is 30 and their minimum
-        size is 5.
+        The x and y axes are log scaled, and are the same
+        for every year.
 
         Args:
-            my_df: The dataframe to display
+            frame: The traces of the displayed year
             gdp_range: The range for the x axis
             co2_range: The range for the y axis
         Returns:
             The generated figure
     '''
     # TODO : Define figure with animation
-    fig = px.scatter(my_df,
-                     x='GDP',
-                     y='CO2',
-                     animation_frame='Year',
-                     animation_group='Country Name',
-                     range_x=gdp_range,
-                     range_y=co2_range,
-                     log_x=True,
-                     log_y=True,
-                     size='Population',
-                     size_max=30,
-                     color='Continent',
-                     custom_data=['Country Name', 'Population'],
-                     )
-    fig.update_traces(marker=dict(sizemin=5))
+    fig = go.Figure(data=frame)
+    fig.update_xaxes(type='log', range=np.log10(gdp_range).tolist())
+    fig.update_yaxes(type='log', range=np.log10(co2_range).tolist())
     return fig
 
 
-def update_animation_hover_template(fig):
+def update_trace_defaults(fig, max_population):
     '''
-        Sets the hover template of the figure,
-        as well as the hover template of each
-        trace of each animation frame of the figure
+        Sets the settings shared by every trace of every
+        frame as defaults of the figure's template, so
+        they are sent once instead of with each trace.
+
+        The traces are markers with the bubble hover
+        template. The markers' maximum size is 30 and
+        their minimum size is 5. The size of a marker
+        only depends on the population, so it is the
+        same in every frame.
+
+        The template must be set before, since it
+        would replace these defaults.
 
         Args:
             fig: The figure to update
+            max_population: The largest population of every year
         Returns:
             The updated figure
     '''
-
-    # TODO : Set the hover template
-
-    fig.update_traces(hovertemplate=hover_template.get_bubble_hover_template())
-
-    # Taken from https://github.com/plotly/plotly.py/issues/2722
-    for frame in fig.frames:
-        for data in frame.data:
-            data.hovertemplate = hover_template.get_bubble_hover_template()
+    fig.update_layout(template_data_scatter=[dict(
+        type='scatter',
+        mode='markers',
+        hovertemplate=hover_template.get_bubble_hover_template(),
+        marker=dict(sizemode='area', sizemin=MIN_SIZE,
+                    sizeref=2 * max_population / MAX_SIZE ** 2)
+    )])
     return fig
 
 
-def update_animation_menu(fig):
-    '''
-        Updates the animation menu to show the current year, and to remove
-        the unnecessary 'Stop' button.
-
-        Args:
-            fig: The figure containing the menu to update
-        Returns
-            The updated figure
-    '''
-    # TODO : Update animation menu
-
-    menu_dict = [{
-        'buttons': [{
-            'args': [None],
-            'label': 'Animate',
-            'method': 'animate',
-        },
-        {
-            'visible': False,
-        }]
-    }]
-
-    slider_dict = [{
-        'currentvalue': {
-            'prefix': 'Data for year: ',
-            'visible': True
-        }
-    }]
-
-    fig.update_layout(sliders=slider_dict)
-    fig.update_layout(updatemenus=menu_dict)
-    return fig
-
 def update_axes_labels(fig):
     '''
         Updates the axes labels with their corresponding titles.
@@ -1,74 +1,59 @@
 '''
     Contains some functions to preprocess the data used in the visualisation.
 '''
+import json
 
+import numpy as np
+import pandas as pd
 
-def round_decimals(my_df):
-    '''
-        Rounds all the numbers in the dataframe to two decimal points
-
-        args:
-            my_df: The dataframe to preprocess
-        returns:
-            The dataframe with rounded numbers
-    '''
-    # Round the dataframe
-    return my_df.round(2)
+# The columns of each country in the data
+COLUMNS = ['Country Name', 'GDP', 'CO2', 'Population', 'Continent']
 
 
-def get_range(col, df1, df2):
+def load_countries(path):
     '''
-        An array containing the minimum and maximum values for the given
-        column in the two dataframes.
+        Reads the data of every year into a single table, with
+        a row per country and year.
 
-        args:
-            col: The name of the column for which we want the range
-            df1: The first dataframe containing a column with the given name
-            df2: The first dataframe containing a column with the given name
-        returns:
-            The minimum and maximum values across the two dataframes
-    '''
-    # TODO : Get the range from the dataframes
-    max_df1 = df1[col].max()
-    max_df2 = df2[col].max()
-    min_df1 = df1[col].min()
-    min_df2 = df2[col].min()
-    total_max = max(max_df1, max_df2)
-    total_min = min(min_df1, min_df2)
-    return [total_min, total_max]
-
-
-def combine_dfs(df1, df2):
-    '''
-        Combines the two dataframes, adding a column 'Year' with the
-        value 2000 for the rows from the first dataframe and the value
-        2015 for the rows from the second dataframe
+        The rows of all the years are collected in one pass, and
+        their years are repeated from the number of rows of each
+        year, instead of normalizing and appending each year.
 
         args:
-            df1: The first dataframe to combine
-            df2: The second dataframe, to be appended to the first
+            path: The path to the .json file, mapping each year
+                to the list of its countries
         returns:
-            The dataframe containing both dataframes provided as arg.
-            Each row of the resulting dataframe has a column 'Year'
-            containing the value 2000 or 2015, depending on its
-            original dataframe.
-    '''
-    # TODO : Combine the two dataframes
-    df1['Year'] = 2000
-    df2['Year'] = 2015
-    return df1.append(df2)
+            The dataframe with columns 'Country Name', 'GDP', 'CO2',
+            'Population', 'Continent' and 'Year'. The years are an
+            ordered categorical, the GDP and CO2 are float64 and
+            the population is int64.
+    '''
+    with open(path) as data_file:
+        data = json.load(data_file)
+
+    years = sorted(data, key=int)
+    records = [record for year in years for record in data[year]]
+    codes = np.repeat(np.arange(len(years)), [len(data[year]) for year in years])
+
+    my_df = pd.DataFrame.from_records(records, columns=COLUMNS)
+    my_df = my_df.astype({'GDP': np.float64, 'CO2': np.float64, 'Population': np.int64})
+    my_df['Year'] = pd.Categorical.from_codes(codes, categories=[int(year) for year in years],
+                                              ordered=True)
+    return my_df
 
 
-def sort_dy_by_yr_continent(my_df):
+def get_ranges(my_df, cols):
     '''
-        Sorts the dataframe by year and then by continent.
+        Gets the minimum and maximum values of the given
+        columns, in a single reduction over their values.
 
         args:
-            my_df: The dataframe to sort
+            my_df: The dataframe containing the columns
+            cols: The names of the columns for which we want the range
         returns:
-            The sorted dataframe.
+            A dictionary mapping each column to its minimum
+            and maximum values
     '''
-    # TODO : Sort the dataframe
-    my_df = my_df.sort_values(['Year', 'Continent'])
-
-    return my_df
+    values = my_df[cols].to_numpy()
+    bounds = np.stack([values.min(axis=0), values.max(axis=0)], axis=1)
+    return dict(zip(cols, bounds.tolist()))